@@ -22,17 +22,18 @@ from app.ghg_consultant import display_ghg_consultant
 from app.company_form import display_company_form
 from app.embedding_gen_db import *
 from backend.rag_process import rag_process
-from backend.ghg_assistant import GHGAssistant
+from backend.registry import get_or_create
+import uuid
 
+# one retriever for the whole process; it only wraps shared models and the Chroma client
 if "rag_class" not in st.session_state:
-    st.session_state.rag_class = rag_process()
+    st.session_state.rag_class = get_or_create(("rag_process",), rag_process)
 
-if "ghg_assistant" not in st.session_state:
-    st.session_state.ghg_assistant = GHGAssistant()
-
-# Initialize chat history
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+# the assistant, chat history and uploaded files live in the process-wide session store
+# (backend.session_store), which spills idle sessions to disk; st.session_state only
+# keeps the id
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 
 st.session_state["company_info"] = None
 
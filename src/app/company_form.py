@@ -7,7 +7,8 @@ import json
 import tempfile
 import os
 from typing import Dict, List, Tuple
-from collections import defaultdict
+
+from backend.session_store import get_session_store
 
 # Set page configuration (MUST be first Streamlit command)
 st.set_page_config(page_title="GHG Emissions Guidance Form", layout="wide")
@@ -249,27 +250,25 @@ def display_company_form():
         accept_multiple_files=True,
     )
 
+    session = get_session_store().get(st.session_state.session_id)
     if uploaded_files:
-        if "processed_files" not in st.session_state:
-            st.session_state.processed_files = defaultdict(dict)
-
         with st.spinner(f"Processing {len(uploaded_files)} files..."):
             for file in uploaded_files:
-                if file.name in st.session_state.processed_files:
+                if file.name in session.processed_files:
                     continue
 
                 filename, text = process_single_file(file)
                 if not text.strip():
-                    st.session_state.processed_files[filename] = {
-                        "status": "failed",
-                        "message": "No text content found",
-                    }
+                    session.add_file(
+                        filename, status="failed", message="No text content found"
+                    )
                     continue
 
                 embeddings = (
                     st.session_state.rag_class.embedding_class.custom_embeddings([text])
                 )
-                st.session_state.processed_files[filename] = {"embeddings": embeddings}
+                # kept as float64 in the session store
+                session.add_file(filename, embeddings=embeddings)
 
     # Submit Button
     if st.button("Submit Form"):
@@ -349,9 +348,9 @@ Operational Details:
 {operational_details if operational_details else "Not provided"}
 """
             if uploaded_files:
-                st.session_state.ghg_assistant.set_context_form(context, st.session_state.processed_files)
+                session.assistant.set_context_form(context, session.processed_files)
             else:
-                 st.session_state.ghg_assistant.set_context_form(context)
+                 session.assistant.set_context_form(context)
             st.success("Form submitted! Guidance is being prepared.")
             st.balloons()
 
@@ -1,36 +1,67 @@
-# inside display_ghg_consultant() after you read `prompt`
+import os
+
+import streamlit as st
+
+# src/ is put on sys.path by app.py
 from backend.state import encode_state
-from backend.rl_agent import RlAgent
+from backend.rl_agent import RLAgent
 from backend.retrieval_policies import action_to_filter
 from backend.reward import feedback_reward
+from backend.registry import get_or_create
+from backend.session_store import get_session_store
+
+
+def display_ghg_consultant():
+    # one agent per process; feedback is appended to data/q_table.wal in the background
+    # instead of rewriting data/q_table.json on every click. Set RL_PERSISTENCE=sqlite
+    # when several app processes should learn into one shared table (data/q_table.sqlite3).
+    rl_agent = get_or_create(
+        ("rl_agent",), lambda: RLAgent(persistence=os.getenv("RL_PERSISTENCE", "wal"))
+    )
+    session = get_session_store().get(st.session_state.session_id)
+
+    st.header("GHG Consultant")
+
+    # replay the chat history
+    for message in session.messages:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+
+    prompt = st.chat_input("Ask about GHG emissions, reporting or compliance")
+    if prompt:
+        state = encode_state(prompt, st.session_state.get("company_info"))
+        action = rl_agent.select(state)
+        meta_filter = action_to_filter(action)
+
+        with st.chat_message("user"):
+            st.markdown(prompt)
+        session.add_message("user", prompt)
+
+        # 1) use the RAG with `meta_filter` to constrain retrieval, and
+        # 2) render the answer token by token while it is generated
+        with st.chat_message("assistant"):
+            response = st.write_stream(
+                st.session_state.rag_class.answer_stream(
+                    question=prompt,
+                    n_results=4,
+                    metadata_filter=meta_filter,
+                    assistant=session.assistant,
+                )
+            )
+        session.add_message("assistant", response)
+        session.last_turn = (state, action)
 
-if "rl_agent" not in st.session_state:
-    st.session_state.rl_agent = RlAgent()  # persists Q in data/q_table.json
-
-state = encode_state(prompt, st.session_state.get("company_info"))
-action = st.session_state.rl_agent.select(state)
-meta_filter = action_to_filter(action)
-
-# 1) use your existing RAG, but pass `meta_filter` to constrain retrieval
-relevant_chunks, metadatas = st.session_state.rag_class.query_documents(
-    question=prompt, n_results=4, metadata_filter=meta_filter  # add this arg in rag_process
-)
-
-# 2) generate the answer as before
-response = st.session_state.ghg_assistant.generate_response(
-    user_prompt=prompt,
-    relevant_chunks=relevant_chunks,
-    results_metadata=metadatas
-)
-
-# 3) show answer + feedback buttons
-st.markdown(response)
-col1, col2 = st.columns(2)
-if col1.button("👍 Helpful"):
-    r = feedback_reward("up")
-    st.session_state.rl_agent.update(state, action, r)
-    st.success("Thanks! Learning updated.")
-if col2.button("👎 Not helpful"):
-    r = feedback_reward("down")
-    st.session_state.rl_agent.update(state, action, r)
-    st.info("Got it. Learning updated.")
+    # 3) feedback buttons for the latest answer
+    if session.last_turn:
+        state, action = session.last_turn
+        col1, col2 = st.columns(2)
+        if col1.button("👍 Helpful"):
+            r = feedback_reward("up")
+            rl_agent.update(state, action, r)
+            session.last_turn = None
+            st.success("Thanks! Learning updated.")
+        if col2.button("👎 Not helpful"):
+            r = feedback_reward("down")
+            rl_agent.update(state, action, r)
+            session.last_turn = None
+            st.info("Got it. Learning updated.")
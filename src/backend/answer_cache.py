@@ -0,0 +1,133 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, Hashable, Optional, Sequence
+from collections import OrderedDict
+import hashlib, itertools, threading, time
+
+import numpy as np
+
+
+def context_key(company_context_hash: Optional[str], chunk_ids: Sequence[str]) -> str:
+    """Combines the company profile and the retrieved chunks into one cache partition key."""
+    digest = hashlib.sha256()
+    digest.update((company_context_hash or "").encode("utf-8"))
+    for chunk_id in sorted(chunk_ids):
+        digest.update(b"\0")
+        digest.update(str(chunk_id).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class SemanticAnswerCache:
+    """
+    Answer cache for near-identical questions.
+
+    Entries are partitioned by `context_key` (company context hash + retrieved chunk ids);
+    within a partition a question hits when the cosine similarity of its MiniLM embedding
+    to a cached question is at least `similarity_threshold`. Entries expire after
+    `ttl_seconds`, the least recently used ones are evicted above `max_entries`, and the
+    whole cache is dropped when `version_source()` (the Chroma collection version) changes.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl_seconds: float = 3600.0,
+        similarity_threshold: float = 0.92,
+        version_source: Optional[Callable[[], Hashable]] = None,
+        version_check_interval: float = 5.0,
+    ) -> None:
+        self.max_entries = int(max_entries)
+        self.ttl_seconds = float(ttl_seconds)
+        self.similarity_threshold = float(similarity_threshold)
+        self.version_source = version_source
+        self.version_check_interval = float(version_check_interval)
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._by_context: Dict[str, Dict[int, None]] = {}
+        self._ids = itertools.count()
+        self._version: Optional[Hashable] = None
+        self._version_checked = 0.0
+        self._counts = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0, "invalidations": 0}
+
+    # ---------- lookup ----------
+    def lookup(self, embedding: np.ndarray, key: str) -> Optional[str]:
+        self._check_version()
+        query = _unit(embedding)
+        now = time.monotonic()
+        with self._lock:
+            best_id, best_sim = None, self.similarity_threshold
+            for entry_id in list(self._by_context.get(key, ())):
+                entry = self._entries[entry_id]
+                if now - entry["created"] > self.ttl_seconds:
+                    self._remove(entry_id)
+                    self._counts["expired"] += 1
+                    continue
+                sim = float(entry["embedding"] @ query)
+                if sim >= best_sim:
+                    best_id, best_sim = entry_id, sim
+
+            if best_id is None:
+                self._counts["misses"] += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self._counts["hits"] += 1
+            return self._entries[best_id]["answer"]
+
+    # ---------- insert ----------
+    def store(self, embedding: np.ndarray, key: str, answer: str) -> None:
+        self._check_version()
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = {
+                "embedding": _unit(embedding),
+                "key": key,
+                "answer": answer,
+                "created": time.monotonic(),
+            }
+            self._by_context.setdefault(key, {})[entry_id] = None
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._counts["evicted"] += 1
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        ids = self._by_context[entry["key"]]
+        ids.pop(entry_id, None)
+        if not ids:
+            del self._by_context[entry["key"]]
+
+    # ---------- invalidation ----------
+    def _check_version(self) -> None:
+        if self.version_source is None:
+            return
+        now = time.monotonic()
+        if now - self._version_checked < self.version_check_interval:
+            return
+        self._version_checked = now
+        version = self.version_source()
+        if version != self._version:
+            if self._version is not None:
+                self.clear()
+                self._counts["invalidations"] += 1
+            self._version = version
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_context.clear()
+
+    # ---------- metrics ----------
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counts["hits"] + self._counts["misses"]
+            return {
+                **self._counts,
+                "entries": len(self._entries),
+                "hit_rate": self._counts["hits"] / lookups if lookups else 0.0,
+            }
+
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
@@ -0,0 +1,117 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from backend.registry import get_token_counter
+
+
+def _overlap(left: str, right: str, min_overlap: int = 20, max_overlap: int = 600) -> int:
+    """Length of the longest suffix of `left` that is also a prefix of `right`."""
+    if len(right) >= min_overlap:
+        probe = right[:min_overlap]
+        tail_start = max(0, len(left) - max_overlap)
+        position = left.find(probe, tail_start)
+        while position != -1:
+            if right.startswith(left[position:]):
+                return len(left) - position
+            position = left.find(probe, position + 1)
+    elif left.endswith(right):
+        return len(right)
+    # overlaps shorter than the probe (one short sentence): exact suffix/prefix check,
+    # only where the shared text starts a word in `left`, so "...the" + "end" is no match
+    for size in range(min(min_overlap - 1, len(left), len(right)), 0, -1):
+        start = len(left) - size
+        if (start == 0 or left[start - 1].isspace()) and left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _join(left: str, right: str) -> str:
+    shared = _overlap(left, right)
+    if shared:
+        return left + right[shared:]
+    return left + "\n" + right
+
+
+def pack_context(
+    chunks: List[str],
+    metas: List[Dict[str, Any]],
+    token_budget: int = 1500,
+    count_tokens: Optional[Callable[[str], int]] = None,
+) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """
+    Packs retrieved chunks into a token budget:
+
+    - chunks with consecutive chunk numbers from the same source are merged into one
+      passage, keeping the text they share (the splitter's sentence overlap) only once
+    - passages whose text is contained in another passage are dropped
+    - passages are added best-first (lowest "distance" in the metadata, otherwise
+      retrieval order) while they fit in `token_budget`
+
+    Returns (texts, metas) in relevance order; merged passages carry the first chunk
+    number plus a "chunk_numbers" list.
+
+    Tokens are counted with the MiniLM tokenizer (get_token_counter), like the
+    conversation budget, unless `count_tokens` is given.
+    """
+    count_tokens = count_tokens or get_token_counter()
+    items = []
+    for rank, (text, meta) in enumerate(zip(chunks, metas)):
+        meta = meta or {}
+        distance = meta.get("distance")
+        items.append(
+            {
+                "text": text,
+                "meta": meta,
+                "score": (distance if distance is not None else float("inf"), rank),
+            }
+        )
+
+    # merge runs of adjacent chunks from the same source
+    passages = []
+    by_source: Dict[Any, List[Dict[str, Any]]] = {}
+    for item in items:
+        if item["meta"].get("chunk_number") is None:
+            passages.append(dict(item, numbers=[]))
+        else:
+            by_source.setdefault(item["meta"].get("source"), []).append(item)
+    for group in by_source.values():
+        group.sort(key=lambda item: item["meta"]["chunk_number"])
+        run = None
+        for item in group:
+            number = item["meta"]["chunk_number"]
+            if run is not None and number == run["numbers"][-1]:
+                run["score"] = min(run["score"], item["score"])  # same chunk retrieved twice
+            elif run is not None and number == run["numbers"][-1] + 1:
+                run["text"] = _join(run["text"], item["text"])
+                run["numbers"].append(number)
+                run["score"] = min(run["score"], item["score"])
+            else:
+                run = dict(item, numbers=[number])
+                passages.append(run)
+
+    # drop passages fully contained in a longer one
+    passages.sort(key=lambda passage: -len(passage["text"]))
+    unique: List[Dict[str, Any]] = []
+    for passage in passages:
+        if not any(passage["text"] in kept["text"] for kept in unique):
+            unique.append(passage)
+
+    packed_texts: List[str] = []
+    packed_metas: List[Dict[str, Any]] = []
+    used = 0
+    for passage in sorted(unique, key=lambda passage: passage["score"]):
+        text = passage["text"]
+        tokens = count_tokens(text)
+        if used + tokens > token_budget:
+            if packed_texts:
+                continue
+            # the best passage alone is over budget: keep as much of it as fits
+            text = text[: int(len(text) * token_budget / tokens)]
+            tokens = count_tokens(text)
+        used += tokens
+        meta = dict(passage["meta"])
+        if len(passage["numbers"]) > 1:
+            meta["chunk_numbers"] = passage["numbers"]
+        packed_texts.append(text)
+        packed_metas.append(meta)
+    return packed_texts, packed_metas
@@ -0,0 +1,204 @@
+from __future__ import annotations
+from typing import Callable, Dict, List, Optional
+import re, threading
+
+from backend.registry import get_token_counter
+
+Message = Dict[str, str]
+
+# entry kinds
+SYSTEM, COMPANY, SUMMARY, RETRIEVAL, USER, ANSWER = (
+    "system", "company", "summary", "retrieval", "user", "answer",
+)
+
+
+def approx_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English text)."""
+    return max(1, len(text) // 4)
+
+
+def tokenizer_counter(tokenizer) -> Callable[[str], int]:
+    """Token counter backed by a Hugging Face tokenizer; calls are serialised."""
+    # a fast tokenizer raises "Already borrowed" when used from two threads at once
+    lock = threading.Lock()
+
+    def count(text: str) -> int:
+        with lock:
+            return len(tokenizer.encode(text, add_special_tokens=False))
+    return count
+
+
+_SUMMARY_PREFIX = "Earlier in this conversation the user asked about: "
+
+
+def extractive_summary(messages: List[Message], max_questions: int = 10) -> str:
+    """
+    Cheap summary of dropped turns: the first sentence of each earlier user question,
+    carried over from the previous summary and capped at the last `max_questions`.
+    """
+    questions: List[str] = []
+    for message in messages:
+        content = message["content"].strip()
+        if message["role"] == "system" and content.startswith(_SUMMARY_PREFIX):
+            questions.extend(content[len(_SUMMARY_PREFIX):].split("; "))
+        elif message["role"] == "user":
+            first = re.split(r"(?<=[.?!])\s", content, maxsplit=1)[0]
+            questions.append(first[:200])
+    return _SUMMARY_PREFIX + "; ".join(questions[-max_questions:])
+
+
+class ConversationMemory:
+    """
+    Token-budgeted chat memory for GHGAssistant.
+
+    - the company context from set_context_form is kept once (a new form replaces it)
+    - only the latest retrieved context is kept; older ones are dropped when a new turn starts
+    - at most `max_stored_turns` question/answer pairs are stored; older pairs are dropped,
+      or folded into a running summary message when `summarize` is given
+    - prompt_messages() returns the system messages, the current turn and as many of the
+      last `history_turns` exchanges as fit in `token_budget`; the retrieved context is
+      truncated if the fixed part alone exceeds the budget
+
+    Tokens are counted with the MiniLM tokenizer the app already loads (get_token_counter)
+    unless `count_tokens` is given. Its WordPiece counts run a little above Llama's BPE
+    counts for English text, so the budget errs on the safe side.
+    """
+
+    def __init__(
+        self,
+        system_prompt: str,
+        token_budget: int = 6000,
+        history_turns: int = 2,
+        max_stored_turns: int = 20,
+        count_tokens: Optional[Callable[[str], int]] = None,
+        summarize: Optional[Callable[[List[Message]], str]] = None,
+    ) -> None:
+        self.system_prompt = system_prompt
+        self.token_budget = int(token_budget)
+        self.history_turns = int(history_turns)
+        self.max_stored_turns = int(max_stored_turns)
+        self.count_tokens = count_tokens or get_token_counter()
+        self.summarize = summarize
+        self.reset()
+
+    # ---------- state ----------
+    def reset(self) -> None:
+        self._entries: List[Dict] = []
+        self._append(SYSTEM, "system", self.system_prompt)
+
+    @property
+    def messages(self) -> List[Message]:
+        return [entry["message"] for entry in self._entries]
+
+    def export_state(self) -> Dict:
+        """JSON-serialisable snapshot of the stored entries (see load_state)."""
+        return {"entries": [
+            {"kind": e["kind"], "role": e["message"]["role"], "content": e["message"]["content"]}
+            for e in self._entries
+        ]}
+
+    def load_state(self, state: Dict) -> None:
+        self._entries = [
+            self._entry(e["kind"], e["role"], e["content"]) for e in state["entries"]
+        ]
+
+    def _entry(self, kind: str, role: str, content: str) -> Dict:
+        return {
+            "kind": kind,
+            "message": {"role": role, "content": content},
+            "tokens": self.count_tokens(content),
+        }
+
+    def _append(self, kind: str, role: str, content: str) -> None:
+        self._entries.append(self._entry(kind, role, content))
+
+    def _drop(self, kind: str) -> None:
+        self._entries = [entry for entry in self._entries if entry["kind"] != kind]
+
+    # ---------- updates ----------
+    def set_company_context(self, content: str) -> None:
+        self._drop(COMPANY)
+        # keep it right after the system prompt
+        self._entries.insert(1, self._entry(COMPANY, "system", content))
+
+    def add_turn(self, user_prompt: str, context: str) -> None:
+        self._drop(RETRIEVAL)
+        self._append(RETRIEVAL, "assistant", context)
+        self._append(USER, "user", user_prompt)
+
+    def add_answer(self, answer: str) -> None:
+        self._append(ANSWER, "assistant", answer)
+        self._compact()
+
+    def _compact(self) -> None:
+        user_positions = [i for i, entry in enumerate(self._entries) if entry["kind"] == USER]
+        excess = len(user_positions) - self.max_stored_turns
+        if excess <= 0:
+            return
+        cut = user_positions[excess]
+        dropped = [
+            entry for entry in self._entries[:cut] if entry["kind"] in (USER, ANSWER)
+        ]
+        self._entries = [
+            entry for i, entry in enumerate(self._entries)
+            if i >= cut or entry["kind"] not in (USER, ANSWER)
+        ]
+        if self.summarize is not None:
+            previous = [e["message"] for e in self._entries if e["kind"] == SUMMARY]
+            summary = self.summarize(previous + [entry["message"] for entry in dropped])
+            self._drop(SUMMARY)
+            position = 1 + sum(1 for e in self._entries if e["kind"] == COMPANY)
+            self._entries.insert(position, self._entry(SUMMARY, "system", summary))
+
+    # ---------- prompt ----------
+    def prompt_messages(self) -> List[Message]:
+        fixed = [e for e in self._entries if e["kind"] in (SYSTEM, COMPANY, SUMMARY)]
+        # the current turn: the latest retrieved context and the question after it
+        current = []
+        if self._entries and self._entries[-1]["kind"] == USER:
+            current = [self._entries[-1]]
+            if len(self._entries) > 1 and self._entries[-2]["kind"] == RETRIEVAL:
+                current.insert(0, self._entries[-2])
+        history_entries = [
+            e for e in self._entries
+            if e["kind"] in (USER, ANSWER) and not any(e is c for c in current)
+        ]
+
+        used = sum(e["tokens"] for e in fixed + current)
+        if used > self.token_budget:
+            current = self._shrink_context(current, used - self.token_budget)
+            used = sum(e["tokens"] for e in fixed + current)
+
+        history: List[Dict] = []
+        turns = 0
+        for entry in reversed(history_entries):
+            if entry["kind"] == USER:
+                turns += 1
+            if turns > self.history_turns or used + entry["tokens"] > self.token_budget:
+                break
+            history.insert(0, entry)
+            used += entry["tokens"]
+        # never start the history with an answer whose question did not fit
+        if history and history[0]["kind"] == ANSWER:
+            history.pop(0)
+
+        return [e["message"] for e in fixed + history + current]
+
+    def _shrink_context(self, current: List[Dict], excess_tokens: int) -> List[Dict]:
+        shrunk = []
+        for entry in current:
+            if entry["kind"] == RETRIEVAL and excess_tokens > 0:
+                content = entry["message"]["content"]
+                keep = max(0, entry["tokens"] - excess_tokens)
+                keep_chars = int(len(content) * keep / max(entry["tokens"], 1))
+                content = content[:keep_chars]
+                entry = {
+                    "kind": RETRIEVAL,
+                    "message": {"role": entry["message"]["role"], "content": content},
+                    "tokens": self.count_tokens(content) if content else 0,
+                }
+            shrunk.append(entry)
+        return shrunk
+
+    def prompt_tokens(self) -> int:
+        return sum(self.count_tokens(m["content"]) for m in self.prompt_messages())
@@ -0,0 +1,158 @@
+from __future__ import annotations
+from typing import Dict, List, Optional, Sequence
+from pathlib import Path
+import atexit, hashlib, sqlite3, threading, time
+
+import numpy as np
+
+
+def normalize_text(text: str) -> str:
+    """Collapses whitespace so re-extracted text with different spacing hits the same entry."""
+    return " ".join(text.split())
+
+
+def cache_key(model_name: str, text: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(model_name.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_text(text).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache keyed by (model name, normalized text hash).
+
+    Vectors are stored as raw float32 (or, with dtype=np.float16, half-precision) bytes
+    in SQLite and always returned as float32. The database runs in WAL mode so
+    several processes (Streamlit workers, ingestion jobs) can share one file. Entries are
+    evicted least-recently-used once the cache holds more than `max_entries` vectors.
+    Reads do not write: hits are timestamped in memory and the last_used column is
+    updated in one batch every `touch_every` hits, before each eviction sweep and on close.
+    """
+
+    # SQLite caps the number of bound parameters per statement
+    _QUERY_BATCH = 500
+
+    def __init__(
+        self,
+        path: Path,
+        max_entries: int = 200_000,
+        evict_every: int = 1000,
+        touch_every: int = 1000,
+        dtype: np.dtype = np.float32,
+    ) -> None:
+        self.path = Path(path)
+        self.dtype = np.dtype(dtype)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = int(max_entries)
+        self.evict_every = int(evict_every)
+        self.touch_every = int(touch_every)
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._puts_since_evict = 0
+        self._touched: Dict[str, float] = {}  # key -> last hit time, not yet written
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " dim INTEGER NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)"
+        )
+        self._conn.commit()
+        # buffered hit times would otherwise be lost on a normal exit
+        atexit.register(self.close)
+
+    # ---------- lookup ----------
+    def get_many(self, model_name: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Returns one float32 vector per text, or None where the text is not cached."""
+        keys = [cache_key(model_name, t) for t in texts]
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), self._QUERY_BATCH):
+                batch = keys[i : i + self._QUERY_BATCH]
+                marks = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, dim, vector FROM embeddings WHERE key IN ({marks})", batch
+                ).fetchall()
+                found.update((key, (dim, blob)) for key, dim, blob in rows)
+            if found:
+                self._touched.update(dict.fromkeys(found, time.time()))
+                if len(self._touched) >= self.touch_every:
+                    self._flush_touches()
+
+        self.hits += sum(1 for k in keys if k in found)
+        self.misses += sum(1 for k in keys if k not in found)
+        return [self._decode(*found[k]) if k in found else None for k in keys]
+
+    @staticmethod
+    def _decode(dim: int, blob: bytes) -> np.ndarray:
+        # entries written with either precision can live in the same file
+        dtype = np.float16 if len(blob) == 2 * dim else np.float32
+        return np.frombuffer(blob, dtype=dtype).astype(np.float32, copy=False)
+
+    # ---------- insert ----------
+    def put_many(self, model_name: str, texts: Sequence[str], vectors: np.ndarray) -> None:
+        vectors = np.asarray(vectors, dtype=self.dtype)
+        now = time.time()
+        rows = [
+            (cache_key(model_name, t), int(v.shape[0]), v.tobytes(), now)
+            for t, v in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, dim, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+            self._puts_since_evict += len(rows)
+            if self._puts_since_evict >= self.evict_every:
+                self._evict()
+
+    def _flush_touches(self) -> None:
+        """Writes the buffered hit times to last_used (caller holds the lock)."""
+        if not self._touched:
+            return
+        self._conn.executemany(
+            "UPDATE embeddings SET last_used = MAX(last_used, ?) WHERE key = ?",
+            [(ts, k) for k, ts in self._touched.items()],
+        )
+        self._conn.commit()
+        self._touched.clear()
+
+    def _evict(self) -> None:
+        """Deletes the least recently used entries above max_entries (caller holds the lock)."""
+        self._puts_since_evict = 0
+        self._flush_touches()
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                " SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (excess,),
+            )
+            self._conn.commit()
+
+    # ---------- misc ----------
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return count
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_touches()
+            self._conn.close()
@@ -1,17 +1,19 @@
 import json
 import csv
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 
-def read_jsonl(path: Path) -> List[Dict[str, Any]]:
-    """Reads a .jsonl file and returns a list of dictionaries."""
-    data = []
+def iter_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    """Yields the dictionaries of a .jsonl file one at a time."""
     if path.exists():
         with path.open("r", encoding="utf-8") as f:
             for line in f:
                 if line.strip():
-                    data.append(json.loads(line))
-    return data
+                    yield json.loads(line)
+
+def read_jsonl(path: Path) -> List[Dict[str, Any]]:
+    """Reads a .jsonl file and returns a list of dictionaries."""
+    return list(iter_jsonl(path))
 
 def save_jsonl(data: List[Dict[str, Any]], path: Path) -> None:
     """Saves a list of dictionaries to a .jsonl file."""
@@ -4,150 +4,23 @@
 # - generates response (user_prompt, context)
 # - evaluate user prompt (if the question has any relation to the topic)
 # - is a valid question (evaluate whether the question is related to GHG topic) TBD
-from os import getenv
-from groq import AsyncGroq
-from groq import Groq
-from spacy import load
+import asyncio
+import hashlib
 from spacy.matcher import PhraseMatcher
 
-from spacy import load
-import spacy
+from backend.registry import (
+    get_embedding_function,
+    get_or_create,
+    get_spacy_model,
+    run_sync,
+)
+from backend.answer_cache import SemanticAnswerCache, context_key
+from backend.conversation import ConversationMemory, extractive_summary
+from backend.llm_scheduler import GATE, GENERATION, get_llm_scheduler
+from backend.relevance import GHG_KEYWORDS, GHGRelevanceClassifier
 
-class GHGAssistant:
-
-    def __init__(
-        self,
-        model: str = "llama-3.3-70b-versatile",
-        temperature: float = 0.5,
-        max_completion_tokens: int = 800,
-    ):
-        self.model, self.temp, self.max_tokens = (
-            model,
-            temperature,
-            max_completion_tokens,
-        )
-        self.disclaimer = (
-            "\n\n**Disclaimer:** Be mindful that this is an AI assistant. "
-            "Please consult with a professional before proceeding."
-        )
-        # self.system_config = """You are a digital consultant specializing in Australia's evolving greenhouse gas (GHG) emission regulations.
-        # Your task is to help companies navigate the complexities of compliance, accurate emission calculations, and industry-specific scope definitions.
-        # Ensure the response is practical, actionable, and aligned with the most recent regulatory updates.
-        # If the answer is not available or unclear, state that you do not know.
-        # """
-
-        self.system_config = """You are a digital GHG emissions consultant focused on Australian companies operating under Australia's evolving climate disclosure regulations, effective from 2025. All companies you assist are based in Australia.
-            Your core role is to guide companies through:
-            - Regulatory compliance under Australian laws (e.g., Treasury Act 2024, ASRS, NGER Scheme)
-            - Emission calculation practices across Scope 1, Scope 2, and Scope 3
-            - Disclosure structure aligned with ASRS (Governance, Strategy, Risk, Metrics & Targets)
-            - Industry-specific guidance and emission sources
-
-            Your responses must:
-            - Be practical, accurate, and tailored to the company’s context
-            - Default to Australian regulatory requirements
-            - Reference other frameworks (e.g., U.S. EPA, ISO 14064, GHG Protocol, ESRS, API Compendium) **only if explicitly requested**
-            - Indicate if data is insufficient or unclear — do not guess
-            - Answer concisely but contextually. Include all relevant information from the context without omitting or summarizing key points. Do not exclude details simply for brevity; instead, express them using clear and efficient language. Your response should be short, but not at the cost of completeness or nuance.
-
-            Your goal is to act as a trustworthy, regulation-aware emissions advisor grounded in Australia’s 2025 climate reporting framework.
-            """
-
-        # configuration of the system role
-        self.conversation = [{"role": "system", "content": self.system_config}]
-        # define legal entities for detection of delicate enquiries
-        self.legal_entities = ["LAW", "NORP", "ORG", "GPE"]
-        self.financial_entities = ["MONEY", "ORG", "PERCENT", "CARDINAL", "PRODUCT"]
-        # Define additional legal and financial keywords
-        self.legal_terms = [
-            "lawsuit",
-            "attorney",
-            "plaintiff",
-            "defendant",
-            "malpractice",
-            "contract",
-            "liability",
-            "sue",
-            "court",
-            "judge",
-            "compliance",
-            "regulation",
-            "policy",
-            "statute",
-        ]
-        self.financial_terms = [
-            "investment",
-            "stocks",
-            "bond",
-            "revenue",
-            "profit",
-            "bankruptcy",
-            "tax",
-            "audit",
-            "loan",
-            "mortgage",
-        ]
-        # nlp model financial and legal topic detections
-        self.nlp = load("en_core_web_md")
-
-        # define GHG keywords
-        self.ghg_keywords = [
-            "ghg",
-            "greenhouse",
-            "emission",
-            "emissions",
-            "carbon",
-            "sustainability",
-            "climate",
-            "regulation",
-            "regulatory",
-            "compliance",
-            "scope",
-            "gas",
-            "reporting",
-            "mitigation",
-            "policy",
-            "energy",
-        ]
 
-    def is_legal_or_financial(self, sample_text: str) -> bool:
-        """
-        takes any text and detects if the text is related to finance or law using a pretrained model
-        this might generate issues if the model is not downloaded
-        """
-        doc = self.nlp(sample_text)
-
-        matcher = PhraseMatcher(vocab=self.nlp.vocab, attr="lower")
-        # add terms to the matcher
-        pattern = [self.nlp(term) for term in self.legal_terms + self.financial_terms]
-        matcher.add("legal_or_financial", pattern)
-        flag = False
-        for ent in doc.ents:
-            if (
-                ent.label_ in self.legal_entities
-                or ent.label_ in self.financial_entities
-            ):
-                flag = True
-        matches = matcher(doc)
-        if matches:
-            flag = True
-        return flag
-
-    # def is_related_to_ghg(
-    #     self,
-    #     user_prompt : str
-    # ) -> bool:
-    #     """
-    #     check if the user prompt is related to GHG regulations
-    #     """
-    #     for key_word in self.ghg_keywords:
-    #         return any(keyword in user_prompt.lower() for keyword in self.ghg_keywords)
-
-    def is_related_to_ghg(self, user_prompt: str) -> str:
-        """
-        check if the user prompt is related to GHG regulations
-        """
-        system_prompt_second_model = """
+GATE_SYSTEM_PROMPT = """
         
         You are are reviewing the context of a Green House and Gas or Environmental Sustainability Governance conversation
         You are given a question and you need to determine if the question is related to Green House and Gas Emissions Regulations or Environmental Sustainability Governance.
@@ -164,54 +37,27 @@ class GHGAssistant:
         Limit your answer to True or False. NOTHING ELSE.
         """
 
-        max_attempts = 3
-        attempt = 0
-
-        while attempt < max_attempts:
-            client_2 = Groq(api_key=getenv("GROQ_API_KEY"))
-            messages_temp = self.conversation.copy()
-            messages_temp = messages_temp[-3:]
-            messages_temp.append(
-                {"role": "system", "content": system_prompt_second_model}
-            )
-            messages_temp.append(
-                {
-                    "role": "assistant",
-                    "content": "Please answer False or True to the next prompt: ",
-                }
-            )
-            messages_temp.append({"role": "user", "content": user_prompt})
-            response = client_2.chat.completions.create(
-                messages=messages_temp,
-                model="llama-3.3-70b-versatile",
-                temperature=0.5,
-                max_completion_tokens=100,
-            )
 
-            result = response.choices[0].message.content.strip()
+def _build_phrase_matcher(nlp, terms):
+    matcher = PhraseMatcher(vocab=nlp.vocab, attr="LOWER")
+    matcher.add("legal_or_financial", list(nlp.tokenizer.pipe(terms)))
+    return matcher
 
-            # Check if the result is exactly 'True' or 'False'
-            if result == "True" or result == "False":
-                return result
 
-            attempt += 1
-            print(f"Attempt {attempt}: Invalid response '{result}'. Retrying...")
+def get_relevance_classifier(keywords):
+    # one classifier (and one set of prototype embeddings and metrics) per process
+    return get_or_create(
+        ("ghg_relevance", tuple(keywords)),
+        lambda: GHGRelevanceClassifier(get_embedding_function(), keywords),
+    )
 
-        # If we've exhausted all attempts, return 'False' as a safe default
-        print("Maximum attempts reached. Defaulting to 'False'")
-        return "False"
 
-# class ghg_assistant #
-# atributes: model parameteres (model, temperature, max completition tokens, system_config)
-# methods:
-# - generates response (user_prompt, context)
-# - evaluate user prompt (if the question has any relation to the topic)
-# - is a valid question (evaluate whether the question is related to GHG topic) TBD
-from os import getenv
-from groq import AsyncGroq
-from groq import Groq
-from spacy import load
-from spacy.matcher import PhraseMatcher
+def get_answer_cache():
+    def load():
+        # imported lazily: the ingestion module pulls in pdfplumber and nltk
+        from backend.embedding_generation import collection_version
+        return SemanticAnswerCache(version_source=collection_version)
+    return get_or_create(("answer_cache",), load)
 
 
 class GHGAssistant:
@@ -221,12 +67,22 @@ class GHGAssistant:
         model: str = "llama-3.3-70b-versatile",
         temperature: float = 0.5,
         max_completion_tokens: int = 800,
+        local_gate: bool = True,
+        answer_cache: bool = True,
+        token_budget: int = 6000,
+        summarize_old_turns: bool = False,
+        count_tokens=None,
     ):
         self.model, self.temp, self.max_tokens = (
             model,
             temperature,
             max_completion_tokens,
         )
+        self.off_topic_message = (
+            "This digital consultant specializes in Australian GHG emission regulations. "
+            "Please rephrase your question to focus on topics such as compliance, emission calculations, "
+            "or scope definitions related to GHG emissions."
+        )
         self.disclaimer = (
             "\n\n**Disclaimer:** Be mindful that this is an AI assistant. "
             "Please consult with a professional before proceeding."
@@ -254,8 +110,14 @@ class GHGAssistant:
             Your goal is to act as a trustworthy, regulation-aware emissions advisor grounded in Australia’s 2025 climate reporting framework.
             """
 
-        # configuration of the system role
-        self.conversation = [{"role": "system", "content": self.system_config}]
+        # configuration of the system role; the memory keeps the prompt within
+        # `token_budget` however long the session gets
+        self.memory = ConversationMemory(
+            self.system_config,
+            token_budget=token_budget,
+            count_tokens=count_tokens,
+            summarize=extractive_summary if summarize_old_turns else None,
+        )
         # define legal entities for detection of delicate enquiries
         self.legal_entities = ["LAW", "NORP", "ORG", "GPE"]
         self.financial_entities = ["MONEY", "ORG", "PERCENT", "CARDINAL", "PRODUCT"]
@@ -288,51 +150,46 @@ class GHGAssistant:
             "loan",
             "mortgage",
         ]
-        # nlp model financial and legal topic detections
-        self.nlp = load("en_core_web_md")
+        # nlp model financial and legal topic detections (loaded once per process)
+        self.nlp = get_spacy_model("en_core_web_md")
+        self.sensitive_entities = set(self.legal_entities + self.financial_entities)
+        # the matcher only compares lowercased tokens, so the patterns just need the tokenizer;
+        # it is compiled once per process and shared by every assistant
+        terms = tuple(self.legal_terms + self.financial_terms)
+        self.legal_financial_matcher = get_or_create(
+            ("legal_financial_matcher", "en_core_web_md", terms),
+            lambda: _build_phrase_matcher(self.nlp, terms),
+        )
 
         # define GHG keywords
-        self.ghg_keywords = [
-            "ghg",
-            "greenhouse",
-            "emission",
-            "emissions",
-            "carbon",
-            "sustainability",
-            "climate",
-            "regulation",
-            "regulatory",
-            "compliance",
-            "scope",
-            "gas",
-            "reporting",
-            "mitigation",
-            "policy",
-            "energy",
-        ]
+        self.ghg_keywords = list(GHG_KEYWORDS)
+        # local keyword + embedding gate, only ambiguous prompts reach the LLM gate
+        self.relevance = get_relevance_classifier(self.ghg_keywords) if local_gate else None
+        # semantic answer cache shared by every session with the same company context
+        self.answer_cache = get_answer_cache() if answer_cache else None
+        self.company_context_hash = None
 
     def is_legal_or_financial(self, sample_text: str) -> bool:
         """
         takes any text and detects if the text is related to finance or law using a pretrained model
         this might generate issues if the model is not downloaded
         """
-        doc = self.nlp(sample_text)
+        return self._doc_is_legal_or_financial(self.nlp(sample_text))
 
-        matcher = PhraseMatcher(vocab=self.nlp.vocab, attr="lower")
-        # add terms to the matcher
-        pattern = [self.nlp(term) for term in self.legal_terms + self.financial_terms]
-        matcher.add("legal_or_financial", pattern)
-        flag = False
+    def classify_legal_or_financial(self, texts, batch_size: int = 64) -> list:
+        """
+        batch version of is_legal_or_financial, runs the texts through nlp.pipe
+        """
+        return [
+            self._doc_is_legal_or_financial(doc)
+            for doc in self.nlp.pipe(texts, batch_size=batch_size)
+        ]
+
+    def _doc_is_legal_or_financial(self, doc) -> bool:
         for ent in doc.ents:
-            if (
-                ent.label_ in self.legal_entities
-                or ent.label_ in self.financial_entities
-            ):
-                flag = True
-        matches = matcher(doc)
-        if matches:
-            flag = True
-        return flag
+            if ent.label_ in self.sensitive_entities:
+                return True
+        return bool(self.legal_financial_matcher(doc))
 
     # def is_related_to_ghg(
     #     self,
@@ -344,46 +201,58 @@ class GHGAssistant:
     #     for key_word in self.ghg_keywords:
     #         return any(keyword in user_prompt.lower() for keyword in self.ghg_keywords)
 
+    def _gate_messages(self, user_prompt: str) -> list:
+        messages_temp = self.conversation[-3:]
+        messages_temp.append({"role": "system", "content": GATE_SYSTEM_PROMPT})
+        messages_temp.append(
+            {
+                "role": "assistant",
+                "content": "Please answer False or True to the next prompt: ",
+            }
+        )
+        messages_temp.append({"role": "user", "content": user_prompt})
+        return messages_temp
+
     def is_related_to_ghg(self, user_prompt: str) -> str:
         """
         check if the user prompt is related to GHG regulations
         """
-        system_prompt_second_model = """
-        
-        You are are reviewing the context of a Green House and Gas or Environmental Sustainability Governance conversation
-        You are given a question and you need to determine if the question is related to Green House and Gas Emissions Regulations or Environmental Sustainability Governance.
-        If the question is related to Green House and Gas Emissions Regulations or Environmental Sustainability Governance, you need to return True.
-        If the question is not related to Green House and Gas Emissions Regulations or Environmental Sustainability Governance, you need to return False.
-        
-        If the question is a greeting, a thank you, or a goodbye,s return True
-        REMEMBER: You are an advisor specialized in greenhouse gas (GHG) emissions. Your role is to help users understand concepts, policies, impacts, metrics, and strategies related to the reduction, measurement, and management of greenhouse gas emissions.
+        # goes through the shared LLM scheduler on the background loop
+        return run_sync(self.is_related_to_ghg_async(user_prompt))
 
-        Your knowledge is strictly limited to the topic of GHG emissions. You are not allowed to generate code, write scripts, perform general technical calculations, answer unrelated questions (such as health, travel, recipes, general math, or any other field), or act as a general virtual assistant.
+    async def is_related_to_ghg_async(self, user_prompt: str) -> str:
+        """
+        async version of is_related_to_ghg, does not block the event loop while waiting
+        """
+        decision = await self.local_gate_async(user_prompt)
+        if decision is not None:
+            return decision
+        return await self.llm_gate_async(user_prompt)
 
-        If a user asks a question outside your area of expertise or requests programming, calculations, or other types of technical assistance not directly related to GHG emissions, you must kindly respond False as you cannot help with that and remind them that your purpose is to serve as a GHG advisor.
-        
-        Limit your answer to True or False. NOTHING ELSE.
+    async def local_gate_async(self, user_prompt: str):
+        """
+        "True"/"False" from the local relevance gate, or None when it is disabled or
+        unsure and the LLM gate has to decide
         """
+        if self.relevance is None:
+            return None
+        # MiniLM encode + cache write; off the loop so the concurrent retrieval and
+        # disclaimer stages of the turn keep running
+        return await asyncio.to_thread(self.relevance.classify, user_prompt)
 
+    async def llm_gate_async(self, user_prompt: str) -> str:
+        """
+        asks the LLM whether the prompt is on topic, retrying invalid answers
+        """
         max_attempts = 3
         attempt = 0
 
+        scheduler = get_llm_scheduler()
         while attempt < max_attempts:
-            client_2 = Groq(api_key=getenv("GROQ_API_KEY"))
-            messages_temp = self.conversation.copy()
-            messages_temp = messages_temp[-3:]
-            messages_temp.append(
-                {"role": "system", "content": system_prompt_second_model}
-            )
-            messages_temp.append(
-                {
-                    "role": "assistant",
-                    "content": "Please answer False or True to the next prompt: ",
-                }
-            )
-            messages_temp.append({"role": "user", "content": user_prompt})
-            response = client_2.chat.completions.create(
-                messages=messages_temp,
+            # gate calls are admitted before queued generation calls
+            response = await scheduler.chat(
+                GATE,
+                messages=self._gate_messages(user_prompt),
                 model="llama-3.3-70b-versatile",
                 temperature=0.5,
                 max_completion_tokens=100,
@@ -391,75 +260,163 @@ class GHGAssistant:
 
             result = response.choices[0].message.content.strip()
 
-            # Check if the result is exactly 'True' or 'False'
             if result == "True" or result == "False":
                 return result
 
             attempt += 1
             print(f"Attempt {attempt}: Invalid response '{result}'. Retrying...")
 
-        # If we've exhausted all attempts, return 'False' as a safe default
         print("Maximum attempts reached. Defaulting to 'False'")
         return "False"
 
-    async def generate_response(self, user_prompt: str, context: str = None):
+    async def generate_response(self, user_prompt: str, context: str = None, chunk_ids=None):
+        """
+        pass the ids of the retrieved chunks as `chunk_ids` to serve near-identical
+        questions with the same company context and chunks from the answer cache
+        """
+        cached = await asyncio.to_thread(self.cached_answer, user_prompt, chunk_ids)
+        if cached is not None:
+            self.remember_cached_answer(user_prompt, context, cached)
+            return cached
 
         # check if the user prompt is related to GHG topic
-        is_related = self.is_related_to_ghg(user_prompt)
+        is_related = await self.is_related_to_ghg_async(user_prompt)
         if is_related != "True":
-            return "This digital consultant specializes in Australian GHG emission regulations. Please rephrase your question to focus on topics such as compliance, emission calculations, or scope definitions related to GHG emissions."
+            return self.off_topic_message
 
-        client = AsyncGroq(api_key=getenv("GROQ_API_KEY"))
-        # initialize the conversation
-        self.conversation.append(
-            # configuration of the response
-            {
-                "role": "assistant",
-                "content": f"\n\nUse the following context to provide tailored, concise, and accurate guidance.'{context}'",
-            }
-        )
-        self.conversation.append(
-            # adding the query from the user
-            {"role": "user", "content": user_prompt}
+        ai_ouput = await self.complete(user_prompt, context)
+
+        # check if the content el related to legal or financial terms
+        if self.is_legal_or_financial(user_prompt):
+            ai_ouput += self.disclaimer
+        # add to the existing memory of the conversation
+        self.remember_answer(ai_ouput)
+        await asyncio.to_thread(self.cache_answer, user_prompt, chunk_ids, ai_ouput)
+        return ai_ouput
+
+    # ---------- answer cache ----------
+    # both encode the question with MiniLM: async callers run them with asyncio.to_thread
+    def cached_answer(self, user_prompt: str, chunk_ids):
+        if self.answer_cache is None or chunk_ids is None:
+            return None
+        key = context_key(self.company_context_hash, chunk_ids)
+        return self.answer_cache.lookup(self._question_embedding(user_prompt), key)
+
+    def cache_answer(self, user_prompt: str, chunk_ids, answer: str) -> None:
+        if self.answer_cache is None or chunk_ids is None:
+            return
+        key = context_key(self.company_context_hash, chunk_ids)
+        self.answer_cache.store(self._question_embedding(user_prompt), key, answer)
+
+    def remember_cached_answer(self, user_prompt: str, context: str, answer: str) -> None:
+        # keep the conversation identical to a generated turn
+        self._add_turn(user_prompt, context)
+        self.remember_answer(answer)
+
+    def _question_embedding(self, user_prompt: str):
+        return get_embedding_function()([user_prompt])[0]
+
+    async def generate_response_stream(self, user_prompt: str, context: str = None, chunk_ids=None):
+        """
+        streaming version of generate_response: yields the answer piece by piece as the
+        tokens arrive, then the disclaimer (if any), and records the full message in
+        self.conversation once the stream is done
+        """
+        cached = await asyncio.to_thread(self.cached_answer, user_prompt, chunk_ids)
+        if cached is not None:
+            self.remember_cached_answer(user_prompt, context, cached)
+            yield cached
+            return
+
+        is_related = await self.is_related_to_ghg_async(user_prompt)
+        if is_related != "True":
+            yield self.off_topic_message
+            return
+
+        # the spaCy check runs while the answer is streaming
+        disclaimer = asyncio.create_task(
+            asyncio.to_thread(self.is_legal_or_financial, user_prompt)
         )
+        parts = []
+        try:
+            async for token in self.stream_completion(user_prompt, context):
+                parts.append(token)
+                yield token
+            if await disclaimer:
+                parts.append(self.disclaimer)
+                yield self.disclaimer
+        finally:
+            disclaimer.cancel()
+        self.remember_answer("".join(parts))
+        await asyncio.to_thread(self.cache_answer, user_prompt, chunk_ids, "".join(parts))
+
+    async def complete(self, user_prompt: str, context: str = None) -> str:
+        """
+        adds the retrieved context and the user prompt to the conversation and returns the
+        model output; the caller appends the disclaimer (if any) and calls remember_answer
+        """
+        self._add_turn(user_prompt, context)
 
-        messages_temp = self.conversation.copy()
-        messages_system = list(filter(lambda l: l.get('role') == "system", messages_temp))
-        messages_no_system = list(filter(lambda l: l.get('role') != "system", messages_temp))
-        messages_no_system = messages_no_system[-3:]
         # generating the response
-        response = await client.chat.completions.create(
-            messages=messages_system + messages_no_system,
+        response = await get_llm_scheduler().chat(
+            GENERATION,
+            messages=self.generation_messages(),
             model=self.model,
             temperature=self.temp,
             # max_completion_tokens=self.max_tokens,
         )
         # retreiving the output
-        ai_ouput = response.choices[0].message.content
+        return response.choices[0].message.content
 
-        # check if the content el related to legal or financial terms
-        if self.is_legal_or_financial(user_prompt):
-            ai_ouput += self.disclaimer
-        # add to the existing memory of the conversation
-        self.conversation.append({"role": "assistant", "content": ai_ouput})
-        return ai_ouput
+    async def stream_completion(self, user_prompt: str, context: str = None):
+        """
+        same as complete, but yields the output tokens as the model produces them
+        """
+        self._add_turn(user_prompt, context)
 
-    def set_context_form(self, json_data, files_context=None):
-        content_prompt = f"""For the subsequent queries of the conversation, please add to your context the following information
-                 provided by the user to provide better guidance based on company details and requirements.
-                 Company Data:{json_data}"""
-         
-        if files_context != None:
-             content_prompt += f"""\n These are additional documents uploaded by the company to obtain tailored guidance.
-                 Documents Information: {files_context}"""
-             
-        self.conversation.append(
-            {
-                "role": "system",
-                "content": content_prompt,
-            }
+        stream = get_llm_scheduler().chat_stream(
+            GENERATION,
+            messages=self.generation_messages(),
+            model=self.model,
+            temperature=self.temp,
         )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def _add_turn(self, user_prompt: str, context: str = None) -> None:
+        # retrieved context for this turn (replaces the previous turn's) + the user query
+        self.memory.add_turn(
+            user_prompt,
+            f"\n\nUse the following context to provide tailored, concise, and accurate guidance.'{context}'",
+        )
+
+    @property
+    def conversation(self) -> list:
+        return self.memory.messages
+
+    def generation_messages(self) -> list:
+        return self.memory.prompt_messages()
 
+    def remember_answer(self, ai_output: str) -> None:
+        self.memory.add_answer(ai_output)
+
+    def reset_conversation(self):
+        """Drops the chat history and company context, keeping only the system prompt."""
+        self.memory.reset()
+        self.company_context_hash = None
+
+    # ---------- session persistence ----------
+    def export_state(self) -> dict:
+        """per-session state only (conversation and company context); models are shared"""
+        return {
+            "memory": self.memory.export_state(),
+            "company_context_hash": self.company_context_hash,
+        }
+
+    def load_state(self, state: dict) -> None:
+        self.memory.load_state(state["memory"])
+        self.company_context_hash = state.get("company_context_hash")
 
     def set_context_form(self, json_data, files_context=None):
         content_prompt = f"""For the subsequent queries of the conversation, please add to your context the following information
@@ -470,9 +427,6 @@ class GHGAssistant:
              content_prompt += f"""\n These are additional documents uploaded by the company to obtain tailored guidance.
                  Documents Information: {files_context}"""
              
-        self.conversation.append(
-            {
-                "role": "system",
-                "content": content_prompt,
-            }
-        )
+        self.company_context_hash = hashlib.sha256(content_prompt.encode("utf-8")).hexdigest()
+        # replaces any earlier form instead of piling up system messages
+        self.memory.set_company_context(content_prompt)
@@ -0,0 +1,412 @@
+from __future__ import annotations
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from collections import deque
+from concurrent.futures import Future
+from os import getenv
+import asyncio, hashlib, heapq, itertools, json, random, threading, time
+
+from backend.conversation import approx_tokens
+from backend.registry import get_async_groq_client, get_or_create
+
+# request priorities: lower runs first
+GATE, GENERATION = 0, 1
+_PRIORITY_NAMES = {GATE: "gate", GENERATION: "generation"}
+
+# Limits shared by every LLM call in the process, read once at import:
+#   GROQ_REQUESTS_PER_MINUTE  requests/min budget (default 0 = no limit)
+#   GROQ_TOKENS_PER_MINUTE    prompt + completion tokens/min budget (default 0 = no limit)
+#   GROQ_MAX_CONCURRENCY      requests in flight at once (default 8)
+#   GROQ_MAX_RETRIES          retries of a 429/5xx/connection error (default 5)
+# Set the per-minute budgets to your account's limits (e.g. 30 and 12000 on Groq's free tier
+# for llama-3.3-70b-versatile) to queue requests locally instead of collecting 429s.
+GROQ_REQUESTS_PER_MINUTE = float(getenv("GROQ_REQUESTS_PER_MINUTE", "0"))
+GROQ_TOKENS_PER_MINUTE = float(getenv("GROQ_TOKENS_PER_MINUTE", "0"))
+GROQ_MAX_CONCURRENCY = int(getenv("GROQ_MAX_CONCURRENCY", "8"))
+GROQ_MAX_RETRIES = int(getenv("GROQ_MAX_RETRIES", "5"))
+
+# completion tokens reserved when a request does not set max_completion_tokens; the
+# reservation is corrected with the usage the API reports
+_EXPECTED_COMPLETION_TOKENS = 256
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `per_minute` / 60 per second."""
+
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if they are now)."""
+        if self.capacity <= 0:
+            return 0.0
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, (amount - self._tokens) / self.rate)
+
+    def take(self, amount: float) -> None:
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount: float) -> None:
+        """Returns (or, if negative, charges) tokens after the real usage is known."""
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class RateLimits:
+    """Process-wide request and token buckets plus the pause set by a 429 response."""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float) -> None:
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def wait_time(self, tokens: float) -> float:
+        return max(
+            self.paused_until - time.monotonic(),
+            self.requests.wait_time(1),
+            self.tokens.wait_time(tokens),
+        )
+
+    def take(self, tokens: float) -> None:
+        self.requests.take(1)
+        self.tokens.take(tokens)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+def get_rate_limits() -> RateLimits:
+    return get_or_create(
+        ("llm_rate_limits",),
+        lambda: RateLimits(GROQ_REQUESTS_PER_MINUTE, GROQ_TOKENS_PER_MINUTE),
+    )
+
+
+class _Waiter:
+    """A request queued for admission, woken on its own event loop."""
+    __slots__ = ("loop", "future", "tokens", "admitted")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, tokens: float) -> None:
+        self.loop = loop
+        self.future = loop.create_future()
+        self.tokens = tokens
+        self.admitted = False
+
+
+def _wake(waiter: _Waiter) -> None:
+    if not waiter.future.done():
+        waiter.future.set_result(None)
+
+
+class LLMScheduler:
+    """
+    Admission control for every chat completion sent from the process, whichever event
+    loop (Streamlit thread, background loop, benchmark) it is sent from:
+
+    - at most `max_concurrency` requests in flight, admitted in priority order (topic gate
+      calls before generation calls, FIFO within a priority)
+    - a request is only sent when the shared requests/min and tokens/min buckets allow it;
+      the token reservation (prompt estimate + max_completion_tokens) is corrected with
+      the usage the API reports
+    - 429, 408/409, 5xx and connection errors are retried with jittered exponential
+      backoff; a 429's Retry-After pauses every queued request, not just the failed one
+    - identical non-streaming requests already in flight share one API call
+
+    Queue depth, wait times, retries and deduplicated calls are available from metrics().
+    The queue, slots and in-flight map are guarded by a threading lock; a queued request
+    is woken on its own loop with call_soon_threadsafe.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[RateLimits] = None,
+        max_concurrency: int = GROQ_MAX_CONCURRENCY,
+        max_retries: int = GROQ_MAX_RETRIES,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        client_factory: Callable[[], Any] = get_async_groq_client,
+        count_tokens: Callable[[str], int] = approx_tokens,
+    ) -> None:
+        self.limits = limits or get_rate_limits()
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_retries = int(max_retries)
+        self.base_delay = float(base_delay)
+        self.max_delay = float(max_delay)
+        self.client_factory = client_factory
+        self.count_tokens = count_tokens
+
+        self._lock = threading.RLock()
+        self._queue: List[Tuple[int, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._timer: Optional[threading.Timer] = None
+        self._in_flight: Dict[str, Dict[str, Any]] = {}
+
+        self._counts = {
+            "submitted": 0, "completed": 0, "failed": 0, "deduplicated": 0,
+            "retries": 0, "rate_limited": 0,
+        }
+        self._max_queue_depth = 0
+        self._waits: Dict[int, deque] = {p: deque(maxlen=1000) for p in _PRIORITY_NAMES}
+
+    # ---------- public API ----------
+    async def chat(self, priority: int = GENERATION, **request: Any):
+        """chat.completions.create(**request) through the scheduler."""
+        key = _request_key(request)
+        with self._lock:
+            entry = self._in_flight.get(key)
+            if entry is None:
+                # the call runs on the first caller's loop; callers on other loops wait
+                # for it through a thread-safe future
+                loop = asyncio.get_running_loop()
+                entry = {"result": Future(), "loop": loop, "waiters": 0}
+                entry["task"] = loop.create_task(self._call(priority, request))
+                entry["task"].add_done_callback(lambda task: self._settle(key, entry, task))
+                self._in_flight[key] = entry
+            else:
+                self._counts["deduplicated"] += 1
+            entry["waiters"] += 1
+
+        try:
+            return await asyncio.shield(asyncio.wrap_future(entry["result"]))
+        finally:
+            with self._lock:
+                entry["waiters"] -= 1
+                # nobody is waiting for the answer any more
+                abandoned = entry["waiters"] == 0 and not entry["result"].done()
+            if abandoned:
+                entry["loop"].call_soon_threadsafe(entry["task"].cancel)
+
+    async def chat_stream(self, priority: int = GENERATION, **request: Any) -> AsyncIterator[Any]:
+        """Streaming chat.completions.create; the slot is held until the stream ends."""
+        self._count("submitted")
+        tokens = self._estimate_tokens(request)
+        try:
+            stream = await self._send(
+                priority,
+                tokens,
+                lambda: self.client_factory().chat.completions.create(stream=True, **request),
+            )
+        except BaseException:
+            self._count("failed")
+            raise
+        try:
+            async for chunk in stream:
+                yield chunk
+            self._count("completed")
+        except Exception:
+            self._count("failed")
+            raise
+        finally:
+            # also when the consumer stops early: drop the HTTP response instead of
+            # leaving the connection busy until the server finishes
+            try:
+                await stream.close()
+            finally:
+                self._release()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    def _settle(self, key: str, entry: Dict[str, Any], task: asyncio.Task) -> None:
+        with self._lock:
+            if self._in_flight.get(key) is entry:
+                del self._in_flight[key]
+        result = entry["result"]
+        if task.cancelled():
+            result.cancel()
+        elif task.exception() is not None:
+            result.set_exception(task.exception())
+        else:
+            result.set_result(task.result())
+
+    # ---------- execution ----------
+    async def _call(self, priority: int, request: Dict[str, Any]):
+        self._count("submitted")
+        tokens = self._estimate_tokens(request)
+        try:
+            response = await self._send(
+                priority, tokens, lambda: self.client_factory().chat.completions.create(**request)
+            )
+        except BaseException:
+            self._count("failed")
+            raise
+        self._release()
+        self._count("completed")
+        usage = getattr(response, "usage", None)
+        used = getattr(usage, "total_tokens", None)
+        if used is not None:
+            self.limits.tokens.give_back(tokens - used)
+        return response
+
+    async def _send(self, priority: int, tokens: float, send: Callable[[], Awaitable[Any]]):
+        """
+        Sends the request once admitted, retrying failures with backoff. Returns while
+        still holding the slot (the caller must _release() it); on error it is released.
+        """
+        attempt = 0
+        await self._acquire(priority, tokens)
+        while True:
+            try:
+                return await send()
+            except BaseException as error:
+                # the slot is given back while backing off so other requests can proceed
+                self._release()
+                if not isinstance(error, Exception):
+                    raise
+                self.limits.tokens.give_back(tokens)
+                status, retry_after = _error_details(error)
+                if attempt >= self.max_retries or not _retryable(error, status):
+                    raise
+                delay = retry_after
+                if delay is None:
+                    # full jitter: uniform in [0, base * 2^attempt], capped
+                    delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                if status == 429:
+                    self._count("rate_limited")
+                    self.limits.pause(delay)
+            attempt += 1
+            self._count("retries")
+            await asyncio.sleep(delay)
+            await self._acquire(priority, tokens)
+
+    # ---------- admission ----------
+    async def _acquire(self, priority: int, tokens: float) -> None:
+        waiter = _Waiter(asyncio.get_running_loop(), tokens)
+        with self._lock:
+            heapq.heappush(self._queue, (priority, next(self._seq), waiter))
+            self._max_queue_depth = max(self._max_queue_depth, len(self._queue))
+        started = time.monotonic()
+        self._pump()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                admitted = waiter.admitted  # admitted just before the cancellation
+                if not admitted:
+                    self._queue = [entry for entry in self._queue if entry[2] is not waiter]
+                    heapq.heapify(self._queue)
+            if admitted:
+                self._release()
+            raise
+        self._waits[priority].append(time.monotonic() - started)
+
+    def _release(self) -> None:
+        with self._lock:
+            self._active -= 1
+        self._pump()
+
+    def _pump(self) -> None:
+        """Admits queued requests in priority order while the limits allow."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            while self._queue and self._active < self.max_concurrency:
+                waiter = self._queue[0][2]
+                if waiter.future.done():  # cancelled while queued
+                    heapq.heappop(self._queue)
+                    continue
+                wait = self.limits.wait_time(waiter.tokens)
+                if wait > 0:
+                    # not tied to any one event loop: the waiters may live on several
+                    self._timer = threading.Timer(wait, self._pump)
+                    self._timer.daemon = True
+                    self._timer.start()
+                    return
+                heapq.heappop(self._queue)
+                try:
+                    waiter.loop.call_soon_threadsafe(_wake, waiter)
+                except RuntimeError:  # its loop is closed; nobody is waiting
+                    continue
+                self.limits.take(waiter.tokens)
+                self._active += 1
+                waiter.admitted = True
+
+    def _estimate_tokens(self, request: Dict[str, Any]) -> float:
+        prompt = sum(self.count_tokens(m.get("content") or "") for m in request.get("messages", []))
+        completion = request.get("max_completion_tokens") or request.get("max_tokens")
+        return prompt + (completion or _EXPECTED_COMPLETION_TOKENS)
+
+    # ---------- metrics ----------
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            queued = [entry for entry in self._queue if not entry[2].future.done()]
+            counts = dict(self._counts)
+            in_flight = self._active
+        waits = {}
+        for priority, samples in self._waits.items():
+            values = sorted(samples)
+            waits[_PRIORITY_NAMES[priority]] = {
+                "count": len(values),
+                "mean_ms": 1000 * sum(values) / len(values) if values else 0.0,
+                "p95_ms": 1000 * values[int(0.95 * (len(values) - 1))] if values else 0.0,
+            }
+        return {
+            **counts,
+            "queue_depth": len(queued),
+            "queue_depth_by_priority": {
+                name: sum(1 for entry in queued if entry[0] == priority)
+                for priority, name in _PRIORITY_NAMES.items()
+            },
+            "max_queue_depth": self._max_queue_depth,
+            "in_flight": in_flight,
+            "wait": waits,
+        }
+
+
+# ---------- helpers ----------
+def _request_key(request: Dict[str, Any]) -> str:
+    payload = json.dumps(request, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _error_details(error: BaseException) -> Tuple[Optional[int], Optional[float]]:
+    """HTTP status and Retry-After (seconds) of a groq/httpx error, when it has them."""
+    status = getattr(error, "status_code", None)
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    retry_after = None
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(header)
+        if value is None:
+            continue
+        try:
+            retry_after = max(0.0, float(value) * scale)
+            break
+        except ValueError:
+            pass
+    return status, retry_after
+
+
+def _retryable(error: BaseException, status: Optional[int]) -> bool:
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    # groq.APIConnectionError / APITimeoutError carry no status
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError") or isinstance(
+        error, (ConnectionError, asyncio.TimeoutError)
+    )
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """The process-wide scheduler shared by every event loop and thread."""
+    return get_or_create(("llm_scheduler",), LLMScheduler)
@@ -0,0 +1,280 @@
+"""
+Offline Q-learning over logged feedback.
+
+Each log is a .jsonl file of events
+    {"ts": "2025-10-01T11:59:21", "prompt": "...", "company": {"sector": ..., "size": ...},
+     "action": "legal_only", "reward": 1.0}
+("tag": "up"/"down" may replace "reward"; see backend.reward.feedback_reward). The logs are
+streamed and encoded in bulk (state.encode_states) into arrays of state ids, action indices
+and rewards; replaying them is then a handful of numpy operations instead of one
+RLAgent.update per event.
+
+Schema: "prompt" and "action" (one of the agent's actions) are required, since the state
+is rebuilt from the prompt; "reward" or "tag" (neither counts as 0), "ts" and "company" are
+optional. Events without the required fields are skipped, and a log in which every event
+is skipped is an error. src/data/rl_logs.csv (ts, action, tag) has no prompts, so it cannot
+be replayed.
+
+    cd src && python -m backend.offline_trainer logs/*.jsonl --out data/q_table.json \
+        --sweep-alpha 0.05,0.1,0.3 --sweep-epsilon 0.05,0.1,0.2 --workers 4
+"""
+from __future__ import annotations
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import chain, product
+from pathlib import Path
+import argparse, json, time
+
+import numpy as np
+
+from backend.file_ops import iter_jsonl
+from backend.q_store import QStore
+from backend.reward import feedback_reward
+from backend.rl_agent import DEFAULT_ACTIONS
+from backend.state import STATE_FIELDS, encode_states
+
+
+@dataclass
+class ReplayLog:
+    """Logged events in log order; `states` are row ids into `store`."""
+    store: QStore
+    states: np.ndarray   # int64
+    actions: np.ndarray  # int64, index into store.actions
+    rewards: np.ndarray  # float64
+    skipped: int = 0
+
+    def __len__(self) -> int:
+        return len(self.rewards)
+
+
+# ---------- loading ----------
+def _event_reward(record: Dict[str, Any]) -> float:
+    if "reward" in record:
+        return float(record["reward"])
+    return feedback_reward(record.get("tag", ""))
+
+
+def encode_events(
+    records: Iterable[Dict[str, Any]], store: QStore, chunk_size: int = 100_000
+) -> ReplayLog:
+    """
+    Encodes `records` chunk by chunk with encode_states, interning new states into `store`.
+    Raises ValueError if there were records but none of them could be used.
+    """
+    action_index = store.action_index
+    chunks: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+    skipped = 0
+    prompts: List[str] = []
+    companies: List[Optional[Dict[str, Any]]] = []
+    months: List[Optional[str]] = []
+    actions: List[int] = []
+    rewards: List[float] = []
+
+    def flush() -> None:
+        columns = encode_states(prompts, companies, months)
+        states = [store.id_of(t) for t in zip(*(columns[f] for f in STATE_FIELDS))]
+        chunks.append((
+            np.array(states, dtype=np.int64),
+            np.array(actions, dtype=np.int64),
+            np.array(rewards, dtype=np.float64),
+        ))
+        for column in (prompts, companies, months, actions, rewards):
+            column.clear()
+
+    for record in records:
+        a = action_index.get(record.get("action"))
+        if a is None or "prompt" not in record:
+            skipped += 1
+            continue
+        prompts.append(record["prompt"])
+        companies.append(record.get("company"))
+        # the month the feedback was given, not the month of the replay
+        months.append(str(record["ts"])[:7] if record.get("ts") else None)
+        actions.append(a)
+        rewards.append(_event_reward(record))
+        if len(prompts) >= chunk_size:
+            flush()
+    if prompts or not chunks:
+        flush()
+    if skipped and not any(len(c[2]) for c in chunks):
+        raise ValueError(
+            f"all {skipped} logged events were skipped: each needs a \"prompt\" and an "
+            f"\"action\" in {store.actions} (see backend.offline_trainer)"
+        )
+
+    return ReplayLog(
+        store,
+        np.concatenate([c[0] for c in chunks]),
+        np.concatenate([c[1] for c in chunks]),
+        np.concatenate([c[2] for c in chunks]),
+        skipped,
+    )
+
+
+def load_logs(
+    paths: Sequence[Path],
+    init: Optional[Dict[str, Dict[str, float]]] = None,
+    actions: Sequence[str] = DEFAULT_ACTIONS,
+) -> ReplayLog:
+    """Streams every log in `paths` (in order) on top of an optional starting Q-table."""
+    for path in paths:
+        if Path(path).suffix != ".jsonl":
+            raise ValueError(f"{path}: expected a .jsonl feedback log (see backend.offline_trainer)")
+    store = QStore.from_dict(init or {}, actions)
+    return encode_events(chain.from_iterable(iter_jsonl(Path(p)) for p in paths), store)
+
+
+# ---------- replay ----------
+def replay(
+    q0: np.ndarray, states: np.ndarray, actions: np.ndarray, rewards: np.ndarray, alpha: float
+) -> np.ndarray:
+    """
+    Q after applying q <- q + alpha * (r - q) for every event in order, as
+    RLAgent.update does without a next state (so gamma plays no part).
+
+    A cell updated with rewards r_1..r_k ends at
+        (1 - alpha)^k q_0 + sum_i alpha (1 - alpha)^(k - i) r_i,
+    so the events are grouped per (state, action) cell with a stable sort and each cell
+    is summed in one pass. `q0` is not modified.
+    """
+    q = np.array(q0, dtype=np.float64)
+    n = len(rewards)
+    if n == 0:
+        return q
+    decay = 1.0 - alpha
+    cells = states * q.shape[1] + actions
+    order = np.argsort(cells, kind="stable")
+    cells = cells[order]
+
+    starts = np.flatnonzero(np.r_[True, cells[1:] != cells[:-1]])
+    counts = np.diff(np.r_[starts, n])
+    # number of later updates to the same cell, for each event
+    later = np.repeat(starts + counts, counts) - 1 - np.arange(n)
+    weighted = alpha * np.power(decay, later) * rewards[order]
+
+    flat = q.reshape(-1)
+    touched = cells[starts]
+    flat[touched] = flat[touched] * np.power(decay, counts) + np.add.reduceat(weighted, starts)
+    return q
+
+
+def replay_score(
+    q: np.ndarray, states: np.ndarray, actions: np.ndarray, rewards: np.ndarray, epsilon: float
+) -> float:
+    """
+    Replay estimate of the average reward of the epsilon-greedy policy over `q`: each
+    logged event counts with the probability that the policy picks the logged action.
+    """
+    if len(rewards) == 0:
+        return 0.0
+    rows = q[states]
+    best = rows == rows.max(axis=1, keepdims=True)
+    greedy = best[np.arange(len(actions)), actions] / best.sum(axis=1)
+    p = epsilon / q.shape[1] + (1.0 - epsilon) * greedy
+    return float((p * rewards).sum() / p.sum())
+
+
+# ---------- hyperparameter sweep ----------
+_worker_data: Dict[str, Any] = {}
+
+
+def _init_worker(q0, states, actions, rewards, split) -> None:
+    _worker_data.update(q0=q0, states=states, actions=actions, rewards=rewards, split=split)
+
+
+def _evaluate(params: Dict[str, float]) -> Dict[str, float]:
+    d = _worker_data
+    s, a, r, split = d["states"], d["actions"], d["rewards"], d["split"]
+    q = replay(d["q0"], s[:split], a[:split], r[:split], params["alpha"])
+    return dict(params, score=replay_score(q, s[split:], a[split:], r[split:], params["epsilon"]))
+
+
+def sweep(
+    log: ReplayLog,
+    grid: List[Dict[str, float]],
+    holdout: float = 0.2,
+    workers: Optional[int] = None,
+) -> List[Dict[str, float]]:
+    """
+    Trains each {"alpha", "epsilon"} in `grid` on the oldest (1 - holdout) of the log and
+    scores it on the rest with replay_score; best first. workers=1 runs in-process.
+    """
+    split = int(len(log) * (1.0 - holdout))
+    init_args = (log.store.values.copy(), log.states, log.actions, log.rewards, split)
+    if workers == 1:
+        _init_worker(*init_args)
+        results = [_evaluate(params) for params in grid]
+    else:
+        # the encoded log is sent once per worker, not once per configuration
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=init_args) as pool:
+            results = list(pool.map(_evaluate, grid))
+    return sorted(results, key=lambda r: r["score"], reverse=True)
+
+
+def train(log: ReplayLog, alpha: float) -> Dict[str, Dict[str, float]]:
+    """Replays the whole log into log.store and returns it in q_table.json format."""
+    values = replay(log.store.values, log.states, log.actions, log.rewards, alpha)
+    log.store.values[:] = values
+    return log.store.to_dict()
+
+
+def save_table(table: Dict[str, Dict[str, float]], path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(table, f, indent=2, ensure_ascii=False)
+    tmp.replace(path)
+
+
+# ---------- CLI ----------
+def _floats(text: str) -> List[float]:
+    return [float(x) for x in text.split(",") if x.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    data_dir = Path(__file__).resolve().parents[1] / "data"
+    parser = argparse.ArgumentParser(description="Train the RL Q-table offline from feedback logs.")
+    parser.add_argument("logs", nargs="+", type=Path, help=".jsonl feedback logs, oldest first")
+    parser.add_argument("--out", type=Path, default=data_dir / "q_table.offline.json",
+                        help="where to write the trained Q-table")
+    parser.add_argument("--init", type=Path, default=None,
+                        help="Q-table JSON to start from (default: all zeros)")
+    parser.add_argument("--alpha", type=float, default=0.3)
+    parser.add_argument("--sweep-alpha", type=_floats, default=None,
+                        help="comma-separated alphas to try; the best one trains the output")
+    parser.add_argument("--sweep-epsilon", type=_floats, default=[0.2],
+                        help="comma-separated exploration rates to score the policies with")
+    parser.add_argument("--holdout", type=float, default=0.2,
+                        help="newest fraction of the log used to score a sweep")
+    parser.add_argument("--workers", type=int, default=None, help="sweep processes (default: CPUs)")
+    args = parser.parse_args(argv)
+
+    init = None
+    if args.init is not None:
+        with args.init.open("r", encoding="utf-8") as f:
+            init = json.load(f)
+
+    t0 = time.perf_counter()
+    log = load_logs(args.logs, init)
+    print(f"Encoded {len(log)} events ({log.skipped} skipped) into {len(log.store)} states "
+          f"in {time.perf_counter() - t0:.2f}s")
+
+    alpha = args.alpha
+    if args.sweep_alpha:
+        t0 = time.perf_counter()
+        grid = [{"alpha": a, "epsilon": e} for a, e in product(args.sweep_alpha, args.sweep_epsilon)]
+        results = sweep(log, grid, args.holdout, args.workers)
+        for r in results:
+            print(f"  alpha={r['alpha']:<6g} epsilon={r['epsilon']:<6g} score={r['score']:.4f}")
+        alpha = results[0]["alpha"]
+        print(f"Swept {len(grid)} configurations in {time.perf_counter() - t0:.2f}s; "
+              f"best alpha={alpha:g}, epsilon={results[0]['epsilon']:g}")
+
+    t0 = time.perf_counter()
+    save_table(train(log, alpha), args.out)
+    print(f"Replayed with alpha={alpha:g} and wrote {args.out} in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
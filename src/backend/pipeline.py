@@ -1,37 +1,138 @@
 # src/backend/pipeline.py
 
-from typing import Dict, Any, Tuple, List, Optional
+from typing import Dict, Any, Tuple, List, Optional, Sequence
+import asyncio
+from functools import partial
 from backend.rl_agent import RLAgent
 from backend.state import encode_state
 from backend.retrieval_policies import action_to_filter
 from backend.rag_process import rag_process
 from backend.ghg_assistant import GHGAssistant
+from backend.registry import get_or_create, run_sync
+from backend.turn_orchestrator import run_turn
 
-def answer_with_rl(prompt: str, company: Dict[str, Any], agent: RLAgent) -> Tuple[str, str, List[str], List[Dict[str, Any]], Dict[str, Any]]:
+Answer = Tuple[str, str, List[str], List[Dict[str, Any]], Dict[str, Any]]
+
+
+class Pipeline:
+    """
+    Long-lived RL + RAG pipeline. The retriever, assistant and agent are created once and
+    reused for every question, and sync calls run on the shared background event loop
+    (so they also share its pooled AsyncGroq client) instead of a new asyncio.run() per
+    question.
+
+    With stateless=True (the default) every answer starts from a fresh conversation, like
+    the old per-call GHGAssistant(); set it to False to keep chat memory across answers.
+    """
+
+    def __init__(
+        self,
+        agent: Optional[RLAgent] = None,
+        n_results: int = 4,
+        stateless: bool = True,
+    ) -> None:
+        self.agent = agent or RLAgent()
+        self.rag = rag_process()
+        self.assistant = GHGAssistant()
+        self.n_results = n_results
+        self.stateless = stateless
+
+    # ---------- answering ----------
+    async def answer_async(
+        self,
+        prompt: str,
+        company: Dict[str, Any],
+        assistant: Optional[GHGAssistant] = None,
+        turn: Optional[Dict[str, Any]] = None,
+    ) -> Answer:
+        """
+        Returns: answer, action, chunks, metas, state_dict
+
+        If a `turn` dict is passed it is filled with the run_turn result (per-stage
+        timings, whether the prompt was on topic, cache hits).
+        """
+        assistant = assistant or self.assistant
+        # 1) state
+        s = encode_state(prompt, company)
+        # 2) choose action
+        a = self.agent.select(s)
+        # 3) map to metadata filter
+        meta_filter = action_to_filter(a, company.get("name"))
+        # 4) + 5) retrieve with filter and generate; the topic gate, retrieval and the
+        # disclaimer check run concurrently (see turn_orchestrator.run_turn)
+        if self.stateless:
+            assistant.reset_conversation()
+        result = await run_turn(
+            assistant,
+            prompt,
+            retrieve=partial(
+                self.rag.query_documents,
+                question=prompt,
+                n_results=self.n_results,
+                metadata_filter=meta_filter,
+            ),
+            # deduplicated, token-budgeted context instead of all raw chunks
+            format_context=self.rag.format_chunks,
+        )
+        if turn is not None:
+            turn.update(result)
+        return result["answer"], a, result["chunks"], result["metas"], s
+
+    def answer(self, prompt: str, company: Dict[str, Any]) -> Answer:
+        return run_sync(self.answer_async(prompt, company))
+
+    def answer_many(
+        self,
+        prompts: Sequence[str],
+        company: Dict[str, Any],
+        concurrency: int = 1,
+    ) -> List[Answer]:
+        """
+        Answers a batch of prompts for offline evaluation, in input order. With
+        concurrency > 1 up to that many questions are in flight at once, each on its own
+        stateless assistant (models are shared, so extra assistants are cheap).
+        """
+        return run_sync(self._answer_many(list(prompts), company, max(1, int(concurrency))))
+
+    async def _answer_many(
+        self, prompts: List[str], company: Dict[str, Any], concurrency: int
+    ) -> List[Answer]:
+        if concurrency == 1:
+            return [await self.answer_async(p, company) for p in prompts]
+
+        assistants: asyncio.Queue = asyncio.Queue()
+        assistants.put_nowait(self.assistant)
+        for _ in range(concurrency - 1):
+            assistants.put_nowait(
+                GHGAssistant(self.assistant.model, self.assistant.temp, self.assistant.max_tokens)
+            )
+
+        async def run(prompt: str) -> Answer:
+            assistant = await assistants.get()
+            try:
+                return await self.answer_async(prompt, company, assistant=assistant)
+            finally:
+                assistants.put_nowait(assistant)
+
+        return list(await asyncio.gather(*(run(p) for p in prompts)))
+
+    # ---------- learning ----------
+    def give_feedback(self, state: Dict[str, Any], action: str, reward: float) -> None:
+        give_feedback(self.agent, state, action, reward)
+
+
+def answer_with_rl(prompt: str, company: Dict[str, Any], agent: RLAgent) -> Answer:
     """
     Returns: answer, action, chunks, metas, state_dict
     """
-    # 1) state
-    s = encode_state(prompt, company)
-    # 2) choose action
-    a = agent.select(s)
-    # 3) map to metadata filter
-    meta_filter = action_to_filter(a, company.get("name"))
-    # 4) retrieve with filter
-    rag = rag_process()
-    chunks, metas = rag.query_documents(question=prompt, n_results=4, metadata_filter=meta_filter)
-    # 5) generate
-    assistant = GHGAssistant()
-    answer = assistant.generate_response  # async in some versions—use asyncio.run if needed
-    try:
-        # if your GHGAssistant.generate_response is async:
-        import asyncio
-        ans = asyncio.run(assistant.generate_response(prompt, context="\n\n".join(chunks)))
-    except TypeError:
-        # if it's sync:
-        ans = assistant.generate_response(prompt, relevant_chunks=chunks, results_metadata=metas)
-
-    return ans, a, chunks, metas, s
+    # reuse one warm pipeline per agent instead of rebuilding every component per question
+    # (the pipeline holds the agent, so its id is not reused while the entry exists)
+    pipeline = get_or_create(("pipeline", id(agent)), partial(Pipeline, agent))
+    return pipeline.answer(prompt, company)
+
+
 def give_feedback(agent: RLAgent, state: Dict[str, Any], action: str, reward: float) -> None:
     agent.update(state, action, reward)
-    agent.save()
\ No newline at end of file
+    # on disk before returning, in every persistence mode: "json" has rewritten
+    # q_table.json and "sqlite" has committed, "wal" waits for the log's fsync
+    agent.flush()
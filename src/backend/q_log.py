@@ -0,0 +1,211 @@
+from __future__ import annotations
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+from pathlib import Path
+import atexit, json, os, threading
+
+import numpy as np
+
+from backend.state import state_from_tuple, state_key
+
+QTable = Dict[str, Dict[str, float]]
+
+# magic line, JSON id table {"actions": [...], "states": [state key, ...]} on one line,
+# then the (n_states, n_actions) Q-values in .npy format
+_SNAPSHOT_MAGIC = b"QSNAP2\n"
+
+
+class QUpdateLog:
+    """
+    Write-ahead log for Q-table updates.
+
+    append() only queues the record (state key, action, new Q-value); a background thread
+    appends records to `<name>.wal` as JSON lines and fsyncs every `fsync_every` records or
+    `fsync_interval` seconds. Every `compact_after` records the table is written to a binary
+    `<name>.snapshot` (JSON ids plus a .npy array, no pickle) and the log is truncated. Records hold absolute values, so replaying
+    a record that is already in the snapshot (crash during compaction) is harmless.
+    """
+
+    def __init__(
+        self,
+        q_path: Path,
+        fsync_every: int = 64,
+        fsync_interval: float = 1.0,
+        compact_after: int = 10_000,
+    ) -> None:
+        self.wal_path = Path(q_path).with_suffix(".wal")
+        self.snapshot_path = Path(q_path).with_suffix(".snapshot")
+        self.fsync_every = int(fsync_every)
+        self.fsync_interval = float(fsync_interval)
+        self.compact_after = int(compact_after)
+
+        self._cond = threading.Condition()
+        self._pending: List[Tuple[str, object]] = []
+        self._unsynced = 0
+        self._since_snapshot = 0  # records queued since the last snapshot
+        self._written = 0
+        self._requested = 0
+        self._closed = False
+        self._urgent = False  # flush()/compact() waiting: write without batching
+        self._error: Optional[BaseException] = None  # set if the writer thread died
+        self._file = None
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- startup ----------
+    def load(self, fallback: Callable[[], QTable]) -> QTable:
+        """Snapshot (or `fallback()` if there is none) with the log replayed on top."""
+        q = self._read_snapshot()
+        if q is None:
+            q = fallback()
+        self._since_snapshot = 0
+        if self.wal_path.exists():
+            with self.wal_path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        state, action, value = json.loads(line)
+                    except ValueError:
+                        break  # torn last record from a crash
+                    q.setdefault(state, {})[action] = float(value)
+                    self._since_snapshot += 1
+        self._start()
+        return q
+
+    def _read_snapshot(self) -> Optional[QTable]:
+        if not self.snapshot_path.exists():
+            return None
+        with self.snapshot_path.open("rb") as f:
+            if f.read(len(_SNAPSHOT_MAGIC)) != _SNAPSHOT_MAGIC:
+                raise ValueError(f"{self.snapshot_path} is not a Q-table snapshot")
+            ids = json.loads(f.readline())
+            values = np.load(f, allow_pickle=False)
+        # shortest decimal form of each float32, as QStore.to_dict writes it
+        rows = values.astype(str).astype(np.float64).tolist()
+        return {key: dict(zip(ids["actions"], row)) for key, row in zip(ids["states"], rows)}
+
+    def _start(self) -> None:
+        self._file = self.wal_path.open("a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="q-update-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ---------- writers ----------
+    def append(self, state: str, action: str, value: float) -> None:
+        with self._cond:
+            self._raise_if_failed()
+            self._pending.append(("update", (state, action, value)))
+            self._requested += 1
+            self._since_snapshot += 1
+            if len(self._pending) >= self.fsync_every:
+                self._cond.notify()
+
+    def compact(
+        self,
+        actions: Sequence[str],
+        states: List[Tuple[Hashable, ...]],
+        values: np.ndarray,
+        wait: bool = False,
+    ) -> None:
+        """
+        Queues a snapshot of a Q-table given as state tuples and their (n_states, n_actions)
+        Q-values. Both must be copies taken by the caller under the same lock as its append()
+        calls, so the snapshot covers exactly the records queued before it; the state keys
+        are built and the file is written on the background thread.
+        """
+        with self._cond:
+            self._raise_if_failed()
+            self._pending.append(("snapshot", (list(actions), states, values)))
+            self._requested += 1
+            self._since_snapshot = 0
+            target = self._requested
+            self._urgent = True
+            self._cond.notify()
+            if wait:
+                self._wait_written(target)
+
+    def flush(self) -> None:
+        """Blocks until every queued record is on disk; raises if the writer failed."""
+        with self._cond:
+            target = self._requested
+            self._urgent = True
+            self._cond.notify()
+            self._wait_written(target)
+
+    def _wait_written(self, target: int) -> None:
+        """Waits (holding self._cond) until record `target` is written or the writer stops."""
+        self._cond.wait_for(
+            lambda: self._written >= target or self._closed or self._error is not None
+        )
+        if self._written < target:
+            self._raise_if_failed()
+
+    def _raise_if_failed(self) -> None:
+        if self._error is not None:
+            raise RuntimeError(f"Q-table update log writer failed: {self._error!r}") from self._error
+
+    @property
+    def needs_compaction(self) -> bool:
+        return self._since_snapshot >= self.compact_after
+
+    def close(self) -> None:
+        with self._cond:
+            if self._closed or self._thread is None:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self._file.close()
+
+    # ---------- background thread ----------
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._closed or self._urgent or len(self._pending) >= self.fsync_every,
+                    timeout=self.fsync_interval,
+                )
+                batch, self._pending = self._pending, []
+                self._urgent = False
+                closed = self._closed
+            try:
+                for kind, payload in batch:
+                    if kind == "update":
+                        self._file.write(json.dumps(payload, ensure_ascii=False) + "\n")
+                        self._unsynced += 1
+                    else:
+                        self._write_snapshot(*payload)
+                if self._unsynced:
+                    self._sync()
+            except Exception as e:
+                # disk full, permissions...: stop, and fail the waiters instead of hanging them
+                print(f"Q-table update log writer stopped: {e!r}")
+                with self._cond:
+                    self._error = e
+                    self._cond.notify_all()
+                return
+            with self._cond:
+                self._written += len(batch)
+                self._cond.notify_all()
+            if closed:
+                return
+
+    def _sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def _write_snapshot(
+        self, actions: List[str], states: List[Tuple[Hashable, ...]], values: np.ndarray
+    ) -> None:
+        ids = {"actions": actions, "states": [state_key(state_from_tuple(t)) for t in states]}
+        tmp = self.snapshot_path.with_suffix(".snapshot.tmp")
+        with tmp.open("wb") as f:
+            f.write(_SNAPSHOT_MAGIC)
+            # json.dumps escapes newlines, so the id table is exactly one line
+            f.write(json.dumps(ids, ensure_ascii=False).encode("utf-8") + b"\n")
+            np.save(f, values, allow_pickle=False)
+            f.flush()
+            os.fsync(f.fileno())
+        tmp.replace(self.snapshot_path)
+        # everything logged so far is in the snapshot
+        self._file.close()
+        self._file = self.wal_path.open("w", encoding="utf-8")
+        self._unsynced = 0
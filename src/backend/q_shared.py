@@ -0,0 +1,115 @@
+from __future__ import annotations
+from typing import Callable, Dict, Iterator, List, Tuple
+from contextlib import contextmanager
+from pathlib import Path
+import sqlite3, time
+
+QTable = Dict[str, Dict[str, float]]
+
+
+class SharedQTable:
+    """
+    Q-table in SQLite (WAL mode) that several processes on one host can update safely.
+
+    Rows are (state key, action, value, seq); every write bumps a global sequence number
+    inside a BEGIN IMMEDIATE transaction, so read-modify-write updates from different
+    workers are serialised instead of overwriting each other. Workers keep their own
+    in-memory copy and call changes() to fetch the rows written since their last look,
+    at most once every `max_staleness` seconds.
+    """
+
+    def __init__(self, db_path: Path, max_staleness: float = 1.0, timeout: float = 30.0) -> None:
+        self.db_path = Path(db_path)
+        self.max_staleness = float(max_staleness)
+        # autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(
+            str(self.db_path), timeout=timeout, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS q (
+                state TEXT NOT NULL,
+                action TEXT NOT NULL,
+                value REAL NOT NULL,
+                seq INTEGER NOT NULL,
+                PRIMARY KEY (state, action)
+            );
+            CREATE INDEX IF NOT EXISTS q_seq ON q (seq);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            INSERT OR IGNORE INTO meta (key, value) VALUES ('seq', 0);
+            """
+        )
+        self._seen_seq = 0
+        self._checked = float("-inf")
+
+    # ---------- reads ----------
+    def changes(self, force: bool = False) -> List[Tuple[str, str, float]]:
+        """(state, action, value) rows written since the previous call (by any process)."""
+        now = time.monotonic()
+        if not force and now - self._checked < self.max_staleness:
+            return []
+        self._checked = now
+        rows = self._conn.execute(
+            "SELECT state, action, value, seq FROM q WHERE seq > ? ORDER BY seq",
+            (self._seen_seq,),
+        ).fetchall()
+        if rows:
+            self._seen_seq = rows[-1][3]
+        return [(state, action, value) for state, action, value, _ in rows]
+
+    # ---------- writes ----------
+    def update(
+        self, state: str, action: str, compute: Callable[[float], float]
+    ) -> Tuple[float, float]:
+        """Atomically replaces Q[state][action] with compute(old value); returns (old, new)."""
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT value FROM q WHERE state = ? AND action = ?", (state, action)
+            ).fetchone()
+            old = row[0] if row else 0.0
+            value = float(compute(old))
+            seq = self._next_seq(conn)
+            conn.execute(
+                "INSERT INTO q (state, action, value, seq) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (state, action) DO UPDATE SET value = excluded.value, seq = excluded.seq",
+                (state, action, value, seq),
+            )
+        return old, value
+
+    def import_table(self, table: QTable) -> bool:
+        """Loads `table` (e.g. an existing q_table.json) if the database is still empty."""
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM q LIMIT 1").fetchone():
+                return False
+            seq = self._next_seq(conn)
+            conn.executemany(
+                "INSERT INTO q (state, action, value, seq) VALUES (?, ?, ?, ?)",
+                [
+                    (state, action, float(value), seq)
+                    for state, actions in table.items()
+                    for action, value in actions.items()
+                ],
+            )
+        return True
+
+    def _next_seq(self, conn: sqlite3.Connection) -> int:
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'seq'")
+        return conn.execute("SELECT value FROM meta WHERE key = 'seq'").fetchone()[0]
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """BEGIN IMMEDIATE takes the write lock up front, so two workers never both read
+        the old value and then race to write."""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._conn
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def close(self) -> None:
+        self._conn.close()
+
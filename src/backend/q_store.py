@@ -0,0 +1,115 @@
+from __future__ import annotations
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+import json, random, sys
+
+import numpy as np
+
+from backend.state import state_from_tuple, state_tuple
+
+QTable = Dict[str, Dict[str, float]]
+StateTuple = Tuple[Hashable, ...]
+
+
+class QStore:
+    """
+    Compact Q-table: each state tuple (see state.state_tuple) is interned to an integer
+    id and its Q-values live in one row of a contiguous float32 (n_states, n_actions)
+    array that doubles in size when full.
+
+    Converts to and from the JSON format of q_table.json ({state_key: {action: q}}).
+    """
+
+    def __init__(self, actions: Sequence[str], initial_capacity: int = 64) -> None:
+        self.actions: List[str] = list(actions)
+        self.action_index: Dict[str, int] = {a: i for i, a in enumerate(self.actions)}
+        self._ids: Dict[StateTuple, int] = {}
+        self._states: List[StateTuple] = []
+        self._keys: List[Optional[str]] = []  # key_of cache; states never change
+        self._q = np.zeros((max(1, initial_capacity), len(self.actions)), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    # ---------- ids ----------
+    def id_of(self, state: StateTuple) -> int:
+        """Id of `state`, adding a zero row for a new state."""
+        sid = self._ids.get(state)
+        if sid is None:
+            sid = len(self._states)
+            if sid == self._q.shape[0]:
+                grown = np.zeros((2 * sid, self._q.shape[1]), dtype=np.float32)
+                grown[:sid] = self._q
+                self._q = grown
+            # encode_state builds new sector/size/month strings per call; keep one copy
+            state = tuple(sys.intern(v) if type(v) is str else v for v in state)
+            self._ids[state] = sid
+            self._states.append(state)
+            self._keys.append(None)
+        return sid
+
+    def find(self, state: StateTuple) -> Optional[int]:
+        return self._ids.get(state)
+
+    def state_of(self, sid: int) -> StateTuple:
+        return self._states[sid]
+
+    def key_of(self, sid: int) -> str:
+        """The q_table.json key of a state (state.state_key of the state dict)."""
+        key = self._keys[sid]
+        if key is None:
+            key = self._keys[sid] = json.dumps(state_from_tuple(self._states[sid]), sort_keys=True)
+        return key
+
+    # ---------- values ----------
+    @property
+    def values(self) -> np.ndarray:
+        """(n_states, n_actions) view of the Q-values."""
+        return self._q[: len(self._states)]
+
+    def copy_rows(self) -> Tuple[List[StateTuple], np.ndarray]:
+        """The interned states and a copy of their Q-values; two memcpys, so cheap under a lock."""
+        return list(self._states), self.values.copy()
+
+    def row(self, sid: int) -> np.ndarray:
+        return self._q[sid]
+
+    def row_dict(self, sid: int) -> Dict[str, float]:
+        """{action: q} for one state, in the same shortest decimal form as to_dict."""
+        return dict(zip(self.actions, self._q[sid].astype(str).astype(np.float64).tolist()))
+
+    def get(self, sid: int, action: str) -> float:
+        return float(self._q[sid, self.action_index[action]])
+
+    def set(self, sid: int, action: str, value: float) -> None:
+        self._q[sid, self.action_index[action]] = value
+
+    def argmax_random(self, sid: int, rng: random.Random = random) -> str:
+        """A random action among those tied for the max Q."""
+        # for a single row of a few actions, plain Python beats numpy's per-call overhead
+        values = self._q[sid].tolist()
+        best_value = max(values)
+        best = [i for i, v in enumerate(values) if v == best_value]
+        return self.actions[best[0] if len(best) == 1 else rng.choice(best)]
+
+    # ---------- JSON format ----------
+    @classmethod
+    def from_dict(cls, table: QTable, actions: Sequence[str]) -> "QStore":
+        actions = list(actions)
+        # keep actions that only appear in the file, as the dict-of-dicts table did
+        for q in table.values():
+            for a in q:
+                if a not in actions:
+                    actions.append(a)
+        store = cls(actions, initial_capacity=max(64, len(table)))
+        for key, q in table.items():
+            sid = store.id_of(state_tuple(json.loads(key)))
+            for a, value in q.items():
+                store.set(sid, a, value)
+        return store
+
+    def to_dict(self) -> QTable:
+        # shortest decimal form of each float32 (0.1, not 0.10000000149011612)
+        values = self.values.astype(str).astype(np.float64).tolist()
+        return {
+            self.key_of(sid): dict(zip(self.actions, row)) for sid, row in enumerate(values)
+        }
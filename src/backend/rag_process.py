@@ -1,25 +1,31 @@
-import os
+from typing import List, Tuple, Optional, Dict, Any
+from functools import partial
+from pathlib import Path
 from dotenv import load_dotenv
-from groq import AsyncGroq
-from backend.embedding_generation import Embedding_Generation
 import streamlit as st
-import asyncio
-from pathlib import Path
 
 # load project-root .env no matter where this file lives
 load_dotenv(Path(__file__).resolve().parents[2] / ".env")
 # parents[2] = up from src/backend/<file>.py to project root
 # adjust to parents[1] if your file lives only one level below src/
 
-from typing import List, Tuple, Optional, Dict, Any
-from pathlib import Path
-from dotenv import load_dotenv
 from backend.embedding_generation import Embedding_Generation
+from backend.context_packing import pack_context
+from backend.registry import iter_sync, run_sync
+from backend.session_store import get_session_store
+from backend.turn_orchestrator import chunk_ids_of, run_turn, stream_turn
+
+
+def _session_assistant():
+    # the current Streamlit session's assistant, from the process-wide session store
+    return get_session_store().get(st.session_state.session_id).assistant
+
 
 class rag_process:
-    def __init__(self):
+    def __init__(self, context_token_budget=1500):
         load_dotenv(dotenv_path=Path(__file__).resolve().parents[2] / ".env")
         self.embedding_class = Embedding_Generation()
+        self.context_token_budget = context_token_budget
 
     # NEW: add metadata_filter param and forward to Chroma via "where"
     def query_documents(
@@ -33,47 +39,126 @@ class rag_process:
         results = self.embedding_class.collection.query(
             query_embeddings=query_embedding,
             n_results=n_results,
-            include=["documents", "metadatas"],
+            include=["documents", "metadatas", "distances"],
             where=metadata_filter if metadata_filter else None,  # <-- key line
         )
 
         # keep your existing return shape
         docs = results.get("documents", [[]])[0]
         metas = results.get("metadatas", [[]])[0]
+        # Chroma always returns the ids; keep them (answer cache key) and the distances
+        # (context packing) with the metadata
+        ids = results.get("ids", [[]])[0]
+        distances = (results.get("distances") or [[None] * len(ids)])[0]
+        metas = [
+            dict(meta or {}, id=chunk_id, distance=distance)
+            for meta, chunk_id, distance in zip(metas, ids, distances)
+        ]
         return docs, metas
 
 
-    def generate_response(self, question, relevant_chunks, results_metadata):
+    def format_chunks(self, relevant_chunks, results_metadata):
+        # Merge overlapping/adjacent chunks and keep the best ones within the token budget
+        relevant_chunks, results_metadata = pack_context(
+            relevant_chunks, results_metadata, token_budget=self.context_token_budget
+        )
+
         # Format context with source information
         formatted_chunks = []
         
         for i, (chunk, metadata) in enumerate(zip(relevant_chunks, results_metadata)):
             # Format with page information if available
             source_info = f"Source: {metadata.get('source', 'Unknown')}"
-            if metadata.get('chunk_number'):
+            if metadata.get('chunk_numbers'):
+                numbers = metadata['chunk_numbers']
+                source_info += f" (Chunks {numbers[0]}-{numbers[-1]})"
+            elif metadata.get('chunk_number'):
                 source_info += f" (Chunk {metadata['chunk_number']})"
             
             formatted_chunk = f"{source_info}\n{chunk}"
             formatted_chunks.append(formatted_chunk)
             
-        context = "\n\n---\n\n".join(formatted_chunks)  # Added separator for better readability
+        return "\n\n---\n\n".join(formatted_chunks)  # Added separator for better readability
+
+    def generate_response(self, question, relevant_chunks, results_metadata, assistant=None):
+        context = self.format_chunks(relevant_chunks, results_metadata)
         
-        ghg_assistant = st.session_state.ghg_assistant
+        ghg_assistant = assistant or _session_assistant()
 
         try:
-            answer = asyncio.run(ghg_assistant.generate_response(
+            # shared loop, so every session reuses the same pooled AsyncGroq client
+            answer = run_sync(ghg_assistant.generate_response(
                 user_prompt=question,
-                context=context
+                context=context,
+                chunk_ids=chunk_ids_of(results_metadata),
             ))
         except Exception as e:
             return f"Error generating response: {str(e)}"
 
         return answer
 
+    def generate_response_stream(self, question, relevant_chunks, results_metadata, assistant=None):
+        """
+        Streaming version of generate_response: a sync generator of answer pieces that
+        st.write_stream can render as they arrive.
+        """
+        context = self.format_chunks(relevant_chunks, results_metadata)
+        ghg_assistant = assistant or _session_assistant()
+
+        try:
+            yield from iter_sync(ghg_assistant.generate_response_stream(
+                user_prompt=question,
+                context=context,
+                chunk_ids=chunk_ids_of(results_metadata),
+            ))
+        except Exception as e:
+            yield f"Error generating response: {str(e)}"
+
+    def answer_stream(self, question, n_results=4, metadata_filter=None, turn=None, assistant=None):
+        """
+        Streaming version of answer. Pass a dict as `turn` to get the retrieved chunks,
+        metadata and stage timings once the stream is exhausted.
+        """
+        ghg_assistant = assistant or _session_assistant()
+        retrieve = partial(
+            self.query_documents,
+            question=question,
+            n_results=n_results,
+            metadata_filter=metadata_filter,
+        )
+
+        try:
+            yield from iter_sync(
+                stream_turn(ghg_assistant, question, retrieve, self.format_chunks, turn)
+            )
+        except Exception as e:
+            yield f"Error generating response: {str(e)}"
+
+    def answer(self, question, n_results=4, metadata_filter=None, assistant=None):
+        """
+        Retrieves and answers in one turn, running the topic gate, retrieval and the
+        disclaimer check concurrently. Returns (answer, relevant_chunks, results_metadata).
+        """
+        ghg_assistant = assistant or _session_assistant()
+        retrieve = partial(
+            self.query_documents,
+            question=question,
+            n_results=n_results,
+            metadata_filter=metadata_filter,
+        )
+
+        try:
+            turn = run_sync(run_turn(ghg_assistant, question, retrieve, self.format_chunks))
+        except Exception as e:
+            return f"Error generating response: {str(e)}", [], []
+
+        return turn["answer"], turn["chunks"], turn["metas"]
+
     def format_context(self, chunks: list, metas: list) -> str:
         """
         Formats the retrieved chunks and metadata into a single string for the LLM context.
         """
+        chunks, metas = pack_context(chunks, metas, token_budget=self.context_token_budget)
         formatted = []
         for ch, md in zip(chunks, metas):
             src = md.get("source", "Unknown")
@@ -0,0 +1,146 @@
+from __future__ import annotations
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Iterator, TypeVar
+from os import getenv
+from pathlib import Path
+import asyncio, threading, weakref
+
+T = TypeVar("T")
+
+# Process-wide registry of heavy resources (models, clients). Each one is built lazily on
+# first use and shared by every caller afterwards, so constructing Embedding_Generation,
+# rag_process or GHGAssistant no longer reloads anything from disk.
+
+_lock = threading.RLock()
+_resources: Dict[Hashable, Any] = {}
+
+
+def get_or_create(key: Hashable, factory: Callable[[], Any]) -> Any:
+    resource = _resources.get(key)
+    if resource is None:
+        with _lock:
+            resource = _resources.get(key)
+            if resource is None:
+                resource = factory()
+                _resources[key] = resource
+    return resource
+
+
+def get_sentence_transformer(model_name: str = "sentence-transformers/all-MiniLM-L12-v2"):
+    def load():
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    return get_or_create(("sentence_transformer", model_name), load)
+
+
+def get_embedding_function(model_name: str = "sentence-transformers/all-MiniLM-L12-v2"):
+    def load():
+        from backend.embedding_generation import MyEmbeddingFunction
+        return MyEmbeddingFunction(model_name)
+    return get_or_create(("embedding_function", model_name), load)
+
+
+def get_token_counter(model_name: str = "sentence-transformers/all-MiniLM-L12-v2"):
+    """conversation.tokenizer_counter over the tokenizer of the shared embedding model."""
+    def load():
+        import copy
+        from backend.conversation import tokenizer_counter
+        # a private copy, so counting never contends with encode() calls on the model
+        return tokenizer_counter(copy.deepcopy(get_sentence_transformer(model_name).tokenizer))
+    return get_or_create(("token_counter", model_name), load)
+
+
+def get_spacy_model(name: str = "en_core_web_md"):
+    def load():
+        import spacy
+        return spacy.load(name)
+    return get_or_create(("spacy", name), load)
+
+
+def get_chroma_client(path: Path):
+    def load():
+        import chromadb
+        return chromadb.PersistentClient(path=str(path))
+    return get_or_create(("chroma", str(Path(path).resolve())), load)
+
+
+# ---------- LLM clients ----------
+# Connection pool settings shared by every Groq client in the process. Clients keep their
+# HTTPS connections alive, so a turn no longer pays for a new TLS handshake per request.
+GROQ_MAX_CONNECTIONS = int(getenv("GROQ_MAX_CONNECTIONS", "50"))
+GROQ_MAX_KEEPALIVE = int(getenv("GROQ_MAX_KEEPALIVE", "20"))
+GROQ_KEEPALIVE_EXPIRY = float(getenv("GROQ_KEEPALIVE_EXPIRY", "60"))
+GROQ_TIMEOUT = float(getenv("GROQ_TIMEOUT", "60"))
+GROQ_CONNECT_TIMEOUT = float(getenv("GROQ_CONNECT_TIMEOUT", "5"))
+
+_async_groq_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _httpx_options() -> Dict[str, Any]:
+    import httpx
+    return {
+        "limits": httpx.Limits(
+            max_connections=GROQ_MAX_CONNECTIONS,
+            max_keepalive_connections=GROQ_MAX_KEEPALIVE,
+            keepalive_expiry=GROQ_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(GROQ_TIMEOUT, connect=GROQ_CONNECT_TIMEOUT),
+    }
+
+
+def get_async_groq_client():
+    """
+    Pooled, keep-alive AsyncGroq client for the running event loop. httpx async
+    connections belong to the loop that opened them, so there is one client per loop;
+    callers that go through run_sync() all share the background loop and its client.
+    Retries are left to backend.llm_scheduler, which also knows about rate limits.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_groq_clients.get(loop)
+    if client is None:
+        import httpx
+        from groq import AsyncGroq
+        client = AsyncGroq(
+            api_key=getenv("GROQ_API_KEY"),
+            http_client=httpx.AsyncClient(**_httpx_options()),
+            max_retries=0,
+        )
+        _async_groq_clients[loop] = client
+    return client
+
+
+# ---------- background event loop ----------
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """A process-wide event loop running in a daemon thread, for sync callers."""
+    def load():
+        loop = asyncio.new_event_loop()
+        threading.Thread(
+            target=loop.run_forever, name="backend-event-loop", daemon=True
+        ).start()
+        return loop
+    return get_or_create(("event_loop",), load)
+
+
+def run_sync(coro: Awaitable[T]) -> T:
+    """Runs a coroutine on the shared background loop and blocks until it finishes."""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result()
+
+
+def iter_sync(agen: AsyncIterator[T]) -> Iterator[T]:
+    """Drives an async generator on the shared background loop from sync code."""
+    loop = get_event_loop()
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
+
+
+def clear() -> None:
+    """Drops every cached resource (mainly for tests and notebooks)."""
+    with _lock:
+        _resources.clear()
@@ -0,0 +1,153 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import re, threading, time
+
+import numpy as np
+
+# Labelled prototypes for the local GHG relevance gate. Greetings, thanks and goodbyes are
+# on topic, matching the instructions given to the LLM gate.
+ON_TOPIC_PROTOTYPES: List[str] = [
+    "What are scope 1, scope 2 and scope 3 emissions?",
+    "How do we calculate our scope 2 emissions from electricity use?",
+    "Which companies must report under the NGER scheme?",
+    "What does AASB S2 require us to disclose about climate risks?",
+    "When do the Australian mandatory climate disclosure rules start for our company?",
+    "How should we report fugitive methane emissions from our operations?",
+    "What emission factors should we use for diesel fleet vehicles?",
+    "How do we set a net zero target and a decarbonisation plan?",
+    "Do carbon offsets count towards our emissions reduction target?",
+    "What is the safeguard mechanism baseline for large emitters?",
+    "How do we measure emissions from purchased goods and services?",
+    "What governance disclosures are needed for climate-related risks?",
+    "Explain the GHG Protocol corporate standard.",
+    "What are the penalties for not complying with emissions reporting?",
+    "Hello",
+    "Hi, can you help me?",
+    "Thank you for your help",
+    "Goodbye",
+]
+
+# words that make a prompt easier to accept (GHGAssistant.ghg_keywords)
+GHG_KEYWORDS: List[str] = [
+    "ghg",
+    "greenhouse",
+    "emission",
+    "emissions",
+    "carbon",
+    "sustainability",
+    "climate",
+    "regulation",
+    "regulatory",
+    "compliance",
+    "scope",
+    "gas",
+    "reporting",
+    "mitigation",
+    "policy",
+    "energy",
+]
+
+OFF_TOPIC_PROTOTYPES: List[str] = [
+    "Write a Python script that sorts a list.",
+    "Can you fix this JavaScript bug for me?",
+    "Give me a recipe for chocolate cake.",
+    "What are the best places to travel in Europe?",
+    "What should I take for a headache?",
+    "Solve this equation: 3x + 5 = 20.",
+    "Who won the football game last night?",
+    "Recommend a good movie to watch tonight.",
+    "Write me a poem about the ocean.",
+    "How do I learn to play the guitar?",
+    "What is the capital of France?",
+    "Help me write a cover letter for a job application.",
+    "Translate this sentence into Spanish.",
+    "What stocks should I buy this year?",
+]
+
+
+class GHGRelevanceClassifier:
+    """
+    Local first-stage topic gate in front of the LLM call. A prompt is scored by MiniLM
+    cosine similarity to the closest on-topic prototype minus the closest off-topic one,
+    and GHG keyword hits make it easier to accept:
+
+    - margin >= accept_margin, or a keyword hit with margin >= keyword_accept_margin -> "True"
+    - no keyword hit and margin <= -reject_margin -> "False"
+    - anything else is ambiguous -> None (escalate to the LLM gate)
+
+    Margins are differences of two cosine similarities. They are asymmetric on purpose: a
+    wrong "True" costs one LLM answer to an off-topic question, but a wrong "False" refuses
+    a real user. So rejecting needs the off-topic side to lead clearly and no keyword hit,
+    while a keyword hit is enough when the prompt is at least as close to the on-topic side.
+    The defaults are conservative starting points rather than fitted values.
+    tests/test_relevance.py checks them against held-out labelled prompts (that check needs
+    the MiniLM model); re-run it after changing the prototypes, the model or the margins,
+    and watch escalation_rate in metrics() in production.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[Sequence[str]], np.ndarray],
+        keywords: Sequence[str],
+        on_topic: Sequence[str] = ON_TOPIC_PROTOTYPES,
+        off_topic: Sequence[str] = OFF_TOPIC_PROTOTYPES,
+        accept_margin: float = 0.15,
+        keyword_accept_margin: float = 0.0,
+        reject_margin: float = 0.10,
+    ) -> None:
+        self.embed = embed
+        self.keyword_pattern = re.compile(
+            r"\b(?:" + "|".join(re.escape(k) for k in keywords) + r")\b", re.IGNORECASE
+        )
+        self.accept_margin = float(accept_margin)
+        self.keyword_accept_margin = float(keyword_accept_margin)
+        self.reject_margin = float(reject_margin)
+        self._on = self._normalize(embed(list(on_topic)))
+        self._off = self._normalize(embed(list(off_topic)))
+
+        self._lock = threading.Lock()
+        self._counts = {"accepted": 0, "rejected": 0, "escalated": 0}
+        self._seconds = 0.0
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    # ---------- scoring ----------
+    def margin(self, prompt: str) -> float:
+        query = self._normalize(self.embed([prompt]))[0]
+        return float(np.max(self._on @ query) - np.max(self._off @ query))
+
+    def classify(self, prompt: str) -> Optional[str]:
+        """Returns "True"/"False" when confident, None when the LLM gate should decide."""
+        started = time.perf_counter()
+        has_keyword = self.keyword_pattern.search(prompt or "") is not None
+        margin = self.margin(prompt or "")
+
+        if margin >= self.accept_margin or (has_keyword and margin >= self.keyword_accept_margin):
+            decision, outcome = "True", "accepted"
+        elif not has_keyword and margin <= -self.reject_margin:
+            decision, outcome = "False", "rejected"
+        else:
+            decision, outcome = None, "escalated"
+
+        with self._lock:
+            self._counts[outcome] += 1
+            self._seconds += time.perf_counter() - started
+        return decision
+
+    # ---------- metrics ----------
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            total = sum(self._counts.values())
+            return {
+                **self._counts,
+                "total": total,
+                "escalation_rate": self._counts["escalated"] / total if total else 0.0,
+                "avg_latency_ms": 1000 * self._seconds / total if total else 0.0,
+                "accept_margin": self.accept_margin,
+                "keyword_accept_margin": self.keyword_accept_margin,
+                "reject_margin": self.reject_margin,
+            }
@@ -1,10 +1,13 @@
 from __future__ import annotations
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 from pathlib import Path
 import json, random, threading
 
 # keep this as a relative import since rl_agent.py is inside backend/
-from .state import state_key
+from .state import state_tuple
+from .q_log import QUpdateLog
+from .q_shared import SharedQTable
+from .q_store import QStore
 
 DEFAULT_ACTIONS: List[str] = ["broad", "legal_only", "financial_only", "company_only"]
 
@@ -18,7 +21,20 @@ class RLAgent:
         gamma: float = 0.9,
         q_path: Path | None = None,
         verbose: bool = False,
+        persistence: str = "json",
+        max_staleness: float = 1.0,
     ) -> None:
+        """
+        persistence="json" rewrites q_table.json on every update (the original behaviour);
+        persistence="wal" appends updates to a write-ahead log on a background thread and
+        compacts it into a binary snapshot (see backend.q_log), so update() is O(1)
+        and does not block select(). Call save() to refresh q_table.json in that mode.
+        persistence="sqlite" keeps the table in <q_path>.sqlite3 (see backend.q_shared) so
+        several app processes can learn into one table; each process sees the others'
+        updates at most `max_staleness` seconds late.
+        """
+        if persistence not in ("json", "wal", "sqlite"):
+            raise ValueError(f"unknown persistence mode {persistence!r}")
         self.actions = actions or DEFAULT_ACTIONS
         self.epsilon = float(epsilon)
         self.alpha   = float(alpha)
@@ -31,8 +47,28 @@ class RLAgent:
         data_dir.mkdir(parents=True, exist_ok=True)
         self.q_path = q_path or (data_dir / "q_table.json")
 
+        self.persistence = persistence
+        self._log = QUpdateLog(self.q_path) if persistence == "wal" else None
+        self._shared = (
+            SharedQTable(self.q_path.with_suffix(".sqlite3"), max_staleness)
+            if persistence == "sqlite" else None
+        )
+
         self._lock = threading.Lock()
-        self._Q: Dict[str, Dict[str, float]] = self._load()
+        # Q-values in a float32 array indexed by interned state ids (see backend.q_store)
+        if self._shared is not None:
+            # the first worker seeds the database from q_table.json
+            self._shared.import_table(self._load())
+            table: Dict[str, Dict[str, float]] = {}
+            for key, action, value in self._shared.changes(force=True):
+                table.setdefault(key, {})[action] = value
+        elif self._log is not None:
+            table = self._log.load(self._load)
+        else:
+            table = self._load()
+        self._store = QStore.from_dict(table, self.actions)
+        # "json" mode: the serialized table, kept up to date one row per update
+        self._table: Optional[Dict[str, Dict[str, float]]] = None
 
     # ---------- persistence ----------
     def _load(self) -> Dict[str, Dict[str, float]]:
@@ -44,28 +80,60 @@ class RLAgent:
                 pass
         return {}
 
-    def _save(self) -> None:
+    def _save(self, sid: Optional[int] = None) -> None:
+        """Rewrites q_path; with `sid`, only that state's row is converted again."""
+        if sid is None or self._table is None:
+            self._table = self._store.to_dict()
+        else:
+            self._table[self._store.key_of(sid)] = self._store.row_dict(sid)
         tmp = self.q_path.with_suffix(".tmp")
         with tmp.open("w", encoding="utf-8") as f:
-            json.dump(self._Q, f, indent=2, ensure_ascii=False)
+            json.dump(self._table, f, indent=2, ensure_ascii=False)
         tmp.replace(self.q_path)
 
-    # ---------- tie-breaker + helpers ----------
-    def _argmax_random(self, q: Dict[str, float]) -> str:
-        """Return a random action among those tied for the max Q."""
-        if not q:  # safety
-            return random.choice(self.actions)
-        maxv = max(q.values())
-        best = [a for a, v in q.items() if v == maxv]
-        return random.choice(best)
-
-    def _ensure_state(self, s: str) -> Dict[str, float]:
-        if s not in self._Q:
-            self._Q[s] = {a: 0.0 for a in self.actions}
-        return self._Q[s]
+    def _persist(self, sid: int, action: str) -> None:
+        """Called under self._lock after Q[sid][action] changed."""
+        if self._shared is not None:
+            return  # update() already committed it
+        if self._log is None:
+            self._save(sid)
+            return
+        self._log.append(self._store.key_of(sid), action, self._store.get(sid, action))
+        if self._log.needs_compaction:
+            self._log.compact(self._store.actions, *self._store.copy_rows())
+
+    def save(self) -> None:
+        """Writes the full Q-table to q_path as JSON (and, in "wal" mode, a snapshot)."""
+        with self._lock:
+            self._refresh(force=True)
+            self._save()
+            if self._log is not None:
+                self._log.compact(self._store.actions, *self._store.copy_rows())
+        if self._log is not None:
+            self._log.flush()
+
+    def flush(self) -> None:
+        """Blocks until every update so far is on disk (only "wal" mode buffers them)."""
+        if self._log is not None:
+            self._log.flush()
+
+    def close(self) -> None:
+        """Flushes and stops the update log ("wal") or closes the database ("sqlite")."""
+        if self._log is not None:
+            self._log.close()
+        if self._shared is not None:
+            self._shared.close()
+
+    def _refresh(self, force: bool = False) -> None:
+        """Pulls other workers' updates into the local copy ("sqlite" mode; under self._lock)."""
+        if self._shared is None:
+            return
+        for key, action, value in self._shared.changes(force):
+            if action in self._store.action_index:
+                self._store.set(self._store.id_of(state_tuple(json.loads(key))), action, value)
 
     # ---------- policy ----------
-    def _epsilon_greedy(self, s: str) -> str:
+    def _epsilon_greedy(self, sid: int) -> str:
         # explore
         if random.random() < self.epsilon:
             a = random.choice(self.actions)
@@ -73,17 +141,17 @@ class RLAgent:
                 print(f"[Explore] Random action: {a}")
             return a
         # exploit (with random tie-break on equal Qs)
-        q = self._ensure_state(s)
-        a = self._argmax_random(q)
+        a = self._store.argmax_random(sid)
         if self.verbose:
-            print(f"[Exploit] Best action: {a} with Q={q[a]:.3f}")
+            print(f"[Exploit] Best action: {a} with Q={self._store.get(sid, a):.3f}")
         return a
 
     # ---------- public API ----------
     def select(self, state: Dict[str, Any]) -> str:
-        s = state_key(state)
+        t = state_tuple(state)
         with self._lock:
-            return self._epsilon_greedy(s)
+            self._refresh()
+            return self._epsilon_greedy(self._store.id_of(t))
 
     def update(
         self,
@@ -92,36 +160,46 @@ class RLAgent:
         reward: float,
         next_state: Dict[str, Any] | None = None,
     ) -> None:
-        s = state_key(state)
+        t = state_tuple(state)
         with self._lock:
-            q = self._ensure_state(s)
-            old = q.get(action, 0.0)
+            sid = self._store.id_of(t)
 
             best_next = 0.0
             if next_state is not None:
-                ns = state_key(next_state)
-                best_next = max(self._ensure_state(ns).values(), default=0.0)
+                ns = self._store.id_of(state_tuple(next_state))
+                best_next = float(self._store.row(ns).max())
 
             target = reward + self.gamma * best_next
-            q[action] = old + self.alpha * (target - old)
+            if self._shared is not None:
+                # apply the step to the shared value, not this worker's possibly stale copy
+                old, new = self._shared.update(
+                    self._store.key_of(sid), action, lambda q: q + self.alpha * (target - q)
+                )
+            else:
+                old = self._store.get(sid, action)
+                new = old + self.alpha * (target - old)
+            self._store.set(sid, action, new)
 
             if self.verbose:
                 print(
-                    f"[Update] State={s}, Action={action}, OldQ={old:.3f}, "
-                    f"Reward={reward:.3f}, Target={target:.3f}, NewQ={q[action]:.3f}"
+                    f"[Update] State={self._store.key_of(sid)}, Action={action}, OldQ={old:.3f}, "
+                    f"Reward={reward:.3f}, Target={target:.3f}, NewQ={new:.3f}"
                 )
 
-            self._save()
+            self._persist(sid, action)
 
     # ---------- inspection ----------
     def q_for(self, state: Dict[str, Any]) -> Dict[str, float]:
-        s = state_key(state)
-        return self._ensure_state(s)
+        t = state_tuple(state)
+        with self._lock:
+            self._refresh()
+            return self._store.row_dict(self._store.id_of(t))
 
     def best_action(self, state: Dict[str, Any]) -> str:
-        s = state_key(state)
-        q = self._ensure_state(s)
-        return self._argmax_random(q)  # <- consistent tie-breaking
+        t = state_tuple(state)
+        with self._lock:
+            self._refresh()
+            return self._store.argmax_random(self._store.id_of(t))  # <- consistent tie-breaking
 
     # ---------- misc ----------
     def decay_epsilon(self, factor: float = 0.99, min_eps: float = 0.01) -> float:
@@ -133,7 +211,7 @@ class RLAgent:
     def set_verbose(self, v: bool = True) -> None:
         self.verbose = v
     def print_q_table(self) -> None:
-        for state, actions in self._Q.items():
+        for state, actions in self._store.to_dict().items():
             print(f"State: {state}")
             for action, q_value in actions.items():
                 print(f"  Action: {action}, Q-value: {q_value:.3f}")
@@ -0,0 +1,283 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+import base64, gzip, hashlib, json, threading, time, weakref
+
+import numpy as np
+
+from backend.registry import get_or_create
+
+
+@dataclass
+class Session:
+    """
+    Everything one chat session owns. Models, the retriever and the RL agent are shared
+    process-wide, so this is just the assistant's conversation memory, the rendered chat
+    history, the pending feedback turn and the uploaded files' embeddings (float64).
+    """
+    session_id: str
+    assistant: Any
+    messages: List[Dict[str, str]] = field(default_factory=list)
+    last_turn: Optional[Tuple[Dict[str, Any], str]] = None
+    processed_files: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    max_messages: int = 200
+    last_used: float = field(default_factory=time.monotonic)
+
+    def add_message(self, role: str, content: str) -> None:
+        self.messages.append({"role": role, "content": content})
+        del self.messages[: -self.max_messages]
+
+    def add_file(self, name: str, embeddings=None, **info: Any) -> None:
+        if embeddings is not None:
+            # full precision: the values end up verbatim in the company context prompt
+            info["embeddings"] = np.asarray(embeddings, dtype=np.float64)
+        self.processed_files[name] = info
+
+    # ---------- serialisation ----------
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "assistant": self.assistant.export_state(),
+            "messages": self.messages,
+            "last_turn": list(self.last_turn) if self.last_turn else None,
+            "processed_files": {
+                name: {key: _encode(value) for key, value in info.items()}
+                for name, info in self.processed_files.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], assistant: Any, max_messages: int) -> "Session":
+        assistant.load_state(data["assistant"])
+        return cls(
+            session_id=data["session_id"],
+            assistant=assistant,
+            messages=data["messages"],
+            last_turn=tuple(data["last_turn"]) if data["last_turn"] else None,
+            processed_files={
+                name: {key: _decode(value) for key, value in info.items()}
+                for name, info in data["processed_files"].items()
+            },
+            max_messages=max_messages,
+        )
+
+
+class SessionStore:
+    """
+    Bounded in-memory store of chat sessions. Sessions idle for more than `idle_timeout`
+    seconds, and the least recently used ones above `max_live_sessions`, are written to
+    `spill_dir` as gzipped JSON and dropped from memory; get() rehydrates them
+    transparently; disk I/O and assistant construction happen outside the store-wide
+    lock. Sessions used in the last `busy_seconds` are never evicted (a turn may
+    still be running), and spilled files older than `max_disk_age` are deleted.
+    """
+
+    def __init__(
+        self,
+        spill_dir: Optional[Path] = None,
+        idle_timeout: float = 900.0,
+        max_live_sessions: int = 100,
+        busy_seconds: float = 60.0,
+        max_disk_age: float = 7 * 24 * 3600.0,
+        sweep_interval: float = 30.0,
+        max_messages: int = 200,
+        assistant_factory: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        # <repo>/src/data/sessions, next to the Q-table
+        self.spill_dir = Path(spill_dir or Path(__file__).resolve().parents[1] / "data" / "sessions")
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        self.idle_timeout = float(idle_timeout)
+        self.max_live_sessions = int(max_live_sessions)
+        self.busy_seconds = float(busy_seconds)
+        self.max_disk_age = float(max_disk_age)
+        self.sweep_interval = float(sweep_interval)
+        self.max_messages = int(max_messages)
+        self.assistant_factory = assistant_factory or _default_assistant
+
+        self._lock = threading.RLock()
+        self._live: "OrderedDict[str, Session]" = OrderedDict()
+        # one lock per session being loaded or spilled; dropped once nobody holds it
+        self._gates: "weakref.WeakValueDictionary[str, threading.Lock]" = (
+            weakref.WeakValueDictionary()
+        )
+        self._last_sweep = time.monotonic()
+        self._counts = {"created": 0, "evicted": 0, "rehydrated": 0, "expired_files": 0}
+
+    # ---------- access ----------
+    def get(self, session_id: str) -> Session:
+        """The live session, rehydrated from disk or created if needed."""
+        with self._lock:
+            session = self._live.get(session_id)
+            gate = self._gate(session_id) if session is None else None
+        if session is None:
+            # file reads and GHGAssistant construction happen outside the store lock; the
+            # per-session gate also waits for a spill of this session still being written
+            with gate:
+                with self._lock:
+                    session = self._live.get(session_id)
+                if session is None:
+                    session = self._rehydrate(session_id) or self._create(session_id)
+                    with self._lock:
+                        self._live[session_id] = session
+        with self._lock:
+            session.last_used = time.monotonic()
+            self._live[session_id] = session
+            self._live.move_to_end(session_id)
+            victims = self._due_victims()
+        self._spill(victims)
+        return session
+
+    def drop(self, session_id: str) -> None:
+        """Forgets a session entirely (memory and disk)."""
+        with self._lock:
+            gate = self._gate(session_id)
+        with gate:
+            with self._lock:
+                self._live.pop(session_id, None)
+            self._path(session_id).unlink(missing_ok=True)
+
+    def _gate(self, session_id: str) -> threading.Lock:
+        """Per-session lock held while that session is loaded or spilled (under self._lock)."""
+        gate = self._gates.get(session_id)
+        if gate is None:
+            gate = self._gates[session_id] = threading.Lock()
+        return gate
+
+    def _create(self, session_id: str) -> Session:
+        session = Session(session_id, self.assistant_factory(), max_messages=self.max_messages)
+        with self._lock:
+            self._counts["created"] += 1
+        return session
+
+    # ---------- eviction ----------
+    def evict(self, session_id: str) -> bool:
+        with self._lock:
+            victim = self._take(session_id)
+        self._spill([victim] if victim else [])
+        return victim is not None
+
+    def sweep(self) -> None:
+        """Evicts idle and surplus sessions and deletes expired spill files."""
+        with self._lock:
+            victims = self._sweep_victims()
+        self._spill(victims)
+
+        cutoff = time.time() - self.max_disk_age
+        expired = 0
+        for path in self.spill_dir.glob("*.json.gz"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    expired += 1
+            except OSError:
+                pass
+        with self._lock:
+            self._counts["expired_files"] += expired
+
+    def _due_victims(self) -> List[Tuple[str, Session, threading.Lock]]:
+        if (
+            len(self._live) > self.max_live_sessions
+            or time.monotonic() - self._last_sweep > self.sweep_interval
+        ):
+            return self._sweep_victims()
+        return []
+
+    def _sweep_victims(self) -> List[Tuple[str, Session, threading.Lock]]:
+        """Takes idle and surplus sessions out of memory (under self._lock)."""
+        now = time.monotonic()
+        self._last_sweep = now
+        victims = []
+        for session_id, session in list(self._live.items()):
+            if now - session.last_used > self.idle_timeout:
+                victims.append(self._take(session_id))
+        # least recently used first
+        for session_id, session in list(self._live.items()):
+            if len(self._live) <= self.max_live_sessions:
+                break
+            if now - session.last_used > self.busy_seconds:
+                victims.append(self._take(session_id))
+        return [v for v in victims if v is not None]
+
+    def _take(self, session_id: str) -> Optional[Tuple[str, Session, threading.Lock]]:
+        """
+        Removes a live session and holds its gate until _spill has written it (under
+        self._lock). The gate is only tried, never waited for, while self._lock is held:
+        a session whose gate is busy is being loaded and stays live.
+        """
+        gate = self._gate(session_id)
+        if session_id not in self._live or not gate.acquire(blocking=False):
+            return None
+        return session_id, self._live.pop(session_id), gate
+
+    def _spill(self, victims: List[Tuple[str, Session, threading.Lock]]) -> None:
+        """Writes taken sessions to disk as gzipped JSON, outside self._lock."""
+        for session_id, session, gate in victims:
+            try:
+                path = self._path(session_id)
+                tmp = path.with_suffix(".tmp")
+                with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+                    json.dump(session.to_dict(), f, ensure_ascii=False)
+                tmp.replace(path)
+                with self._lock:
+                    self._counts["evicted"] += 1
+            finally:
+                gate.release()
+
+    def _rehydrate(self, session_id: str) -> Optional[Session]:
+        """Loads a spilled session (caller holds its gate, not self._lock)."""
+        path = self._path(session_id)
+        if not path.exists():
+            return None
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+            session = Session.from_dict(data, self.assistant_factory(), self.max_messages)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not restore session {session_id}: {e}")
+            return None
+        path.unlink(missing_ok=True)
+        with self._lock:
+            self._counts["rehydrated"] += 1
+        return session
+
+    def _path(self, session_id: str) -> Path:
+        name = hashlib.sha256(session_id.encode("utf-8")).hexdigest()
+        return self.spill_dir / f"{name}.json.gz"
+
+    # ---------- metrics ----------
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._counts,
+                "live": len(self._live),
+                "on_disk": sum(1 for _ in self.spill_dir.glob("*.json.gz")),
+            }
+
+
+def _default_assistant():
+    from backend.ghg_assistant import GHGAssistant
+    return GHGAssistant()
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, np.ndarray):
+        return {
+            "__ndarray__": base64.b64encode(np.ascontiguousarray(value).tobytes()).decode("ascii"),
+            "dtype": str(value.dtype),
+            "shape": list(value.shape),
+        }
+    return value
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, dict) and "__ndarray__" in value:
+        data = base64.b64decode(value["__ndarray__"])
+        return np.frombuffer(data, dtype=value["dtype"]).reshape(value["shape"]).copy()
+    return value
+
+
+def get_session_store() -> SessionStore:
+    """The process-wide session store shared by every Streamlit session."""
+    return get_or_create(("session_store",), SessionStore)
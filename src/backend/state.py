@@ -1,8 +1,10 @@
 from __future__ import annotations
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Sequence, Tuple
 import json, re
 from datetime import datetime
 
+import numpy as np
+
 TOPIC_BUCKETS = {
     "legal":     [r"\blaw|legal|sue|regulat|policy|compliance|malpractice\b"],
     "fin":       [r"\bbudget|cost|price|fund|profit|finance|investment\b"],
@@ -10,13 +12,68 @@ TOPIC_BUCKETS = {
     "other":     [r".*"],
 }
 
-def _bucket(text: str, buckets: Dict[str, list[str]]) -> str:
-    t = (text or "").lower()
+def _alternatives(pattern: str) -> List[str]:
+    """`pattern` split on its top-level "|"."""
+    alts, depth, start, i = [], 0, 0, 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            i += 1
+        elif c in "([":
+            depth += 1
+        elif c in ")]":
+            depth -= 1
+        elif c == "|" and depth == 0:
+            alts.append(pattern[start:i])
+            start = i + 1
+        i += 1
+    alts.append(pattern[start:])
+    return alts
+
+def _keywords(patterns: list[str]) -> Optional[Tuple[str, ...]]:
+    """
+    Words at least one of which is in any text the patterns match (the literal start of
+    each alternative, e.g. "scope" for r"scope\s*[123]\b"), or None if an alternative
+    has no literal start.
+    """
+    words = []
+    for pattern in patterns:
+        for alt in _alternatives(pattern):
+            m = re.match(r"(?:\\b)*([a-z0-9 ]*)([?*{]?)", alt)
+            word = m.group(1)[:-1] if m.group(2) else m.group(1)  # "colou?r" -> "colo"
+            if not word:
+                return None
+            words.append(word)
+    return tuple(dict.fromkeys(words))
+
+BucketMatcher = Tuple[List[Tuple[str, "re.Pattern[str]", Optional[Tuple[str, ...]]]], str]
+
+def _compile_buckets(buckets: Dict[str, list[str]]) -> BucketMatcher:
+    """
+    Each bucket's patterns as one compiled regex plus the keywords it needs, in priority
+    order. A bucket that matches the empty string (the ".*" catch-all) matches every text,
+    so it and the buckets after it are left out and it becomes the fallback.
+    """
+    compiled = []
     for name, patterns in buckets.items():
-        for p in patterns:
-            if re.search(p, t):
-                return name
-    return "other"
+        if any(re.search(p, "") for p in patterns):
+            return compiled, name
+        compiled.append((name, re.compile("|".join(patterns)), _keywords(patterns)))
+    return compiled, "other"
+
+_TOPIC_MATCHER = _compile_buckets(TOPIC_BUCKETS)
+
+def _bucket(text: str, buckets: Dict[str, list[str]] = TOPIC_BUCKETS) -> str:
+    """The first bucket (in dict order) with a pattern found in `text`."""
+    compiled, fallback = _TOPIC_MATCHER if buckets is TOPIC_BUCKETS else _compile_buckets(buckets)
+    t = (text or "").lower()
+    for name, pattern, keywords in compiled:
+        # substring checks are much cheaper than the regex, which most texts fail anyway
+        if keywords is not None and not any(k in t for k in keywords):
+            continue
+        if pattern.search(t):
+            return name
+    return fallback
 
 def encode_state(prompt: str, company_info: Dict[str, Any] | None) -> Dict[str, Any]:
     topic  = _bucket(prompt, TOPIC_BUCKETS)
@@ -26,5 +83,54 @@ def encode_state(prompt: str, company_info: Dict[str, Any] | None) -> Dict[str,
     month  = datetime.utcnow().strftime("%Y-%m")
     return {"topic": topic, "len": length, "sector": sector, "size": size, "month": month}
 
+def encode_states(
+    prompts: Sequence[str],
+    companies: Sequence[Dict[str, Any] | None] | Dict[str, Any] | None = None,
+    months: Sequence[str | None] | None = None,
+) -> Dict[str, np.ndarray]:
+    """
+    encode_state for many prompts at once, as one object array of strings per field.
+    `companies` is one company_info per prompt or a single one for all of them; `months`
+    overrides the current month per prompt (e.g. when re-encoding logged events), with
+    None entries meaning the current month, which is computed once for the whole batch.
+    """
+    n = len(prompts)
+    if companies is None or isinstance(companies, dict):
+        companies = [companies] * n
+    month = datetime.utcnow().strftime("%Y-%m")
+
+    lengths = np.fromiter(map(len, prompts), dtype=np.int64, count=n)
+    length = np.where(lengths < 80, "short", np.where(lengths < 200, "medium", "long"))
+    columns = {
+        "topic":  [_bucket(p) for p in prompts],
+        "len":    length.tolist(),
+        "sector": [(c or {}).get("sector", "unknown").lower() for c in companies],
+        "size":   [(c or {}).get("size", "unknown").lower() for c in companies],
+        "month":  [month] * n if months is None else [m or month for m in months],
+    }
+    out = {}
+    for name, values in columns.items():
+        out[name] = np.empty(n, dtype=object)
+        out[name][:] = values
+    return out
+
 def state_key(state: Dict[str, Any]) -> str:
     return json.dumps(state, sort_keys=True)
+
+# encode_state's fields in sorted order, as state_key serialises them
+STATE_FIELDS = ("len", "month", "sector", "size", "topic")
+_STATE_FIELD_SET = frozenset(STATE_FIELDS)
+
+def state_tuple(state: Dict[str, Any]) -> Tuple:
+    """
+    Hashable form of a state, equivalent to state_key but much cheaper to build: the
+    values in STATE_FIELDS order for encode_state output, else the sorted (key, value) pairs.
+    """
+    if state.keys() == _STATE_FIELD_SET:
+        return tuple([state[k] for k in STATE_FIELDS])
+    return tuple(sorted(state.items()))
+
+def state_from_tuple(t: Tuple) -> Dict[str, Any]:
+    if t and isinstance(t[0], tuple):
+        return dict(t)
+    return dict(zip(STATE_FIELDS, t))
@@ -0,0 +1,238 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio, time
+
+from backend.ghg_assistant import GHGAssistant
+
+Retrieve = Callable[[], Tuple[List[str], List[Dict[str, Any]]]]
+FormatContext = Callable[[List[str], List[Dict[str, Any]]], str]
+
+
+def _join_chunks(chunks: List[str], metas: List[Dict[str, Any]]) -> str:
+    return "\n\n".join(chunks)
+
+
+async def _timed(stage: str, timings: Dict[str, float], awaitable):
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[stage] = time.perf_counter() - started
+
+
+async def run_turn(
+    assistant: GHGAssistant,
+    user_prompt: str,
+    retrieve: Optional[Retrieve] = None,
+    format_context: FormatContext = _join_chunks,
+) -> Dict[str, Any]:
+    """
+    Runs one chat turn with the independent stages overlapped:
+
+    - the topic gate (LLM call), vector retrieval and the spaCy disclaimer check start
+      together; retrieval and spaCy run in worker threads so they do not block the loop
+      (they first wait for the local gate's decision, see _start_stages)
+    - if the gate says False, retrieval and the disclaimer check are cancelled and the
+      off-topic message is returned
+    - generation starts as soon as both the gate and retrieval are done
+
+    - if the semantic answer cache has an answer for this question, company context and
+      set of retrieved chunks, it is returned without generating
+
+    `retrieve` is a blocking callable returning (chunks, metas). Returns a dict with the
+    answer, whether the prompt was on topic, the retrieved chunks/metas, per-stage
+    timings in seconds and, on a cache hit, "cached": True.
+    """
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    gate, retrieval, disclaimer = _start_stages(assistant, user_prompt, retrieve, timings)
+    speculative = (retrieval, disclaimer)
+
+    try:
+        related = await gate
+        if related != "True":
+            for task in speculative:
+                task.cancel()
+            await asyncio.gather(*speculative, return_exceptions=True)
+            timings["total"] = time.perf_counter() - started
+            return {
+                "answer": assistant.off_topic_message,
+                "related": False,
+                "chunks": [],
+                "metas": [],
+                "timings": timings,
+            }
+
+        chunks, metas = await retrieval
+        context = format_context(chunks, metas)
+        chunk_ids = chunk_ids_of(metas)
+        # MiniLM encode + cache scan: keep them off the event loop
+        cached = await asyncio.to_thread(assistant.cached_answer, user_prompt, chunk_ids)
+        if cached is not None:
+            disclaimer.cancel()
+            assistant.remember_cached_answer(user_prompt, context, cached)
+            timings["total"] = time.perf_counter() - started
+            return {
+                "answer": cached,
+                "related": True,
+                "chunks": chunks,
+                "metas": metas,
+                "timings": timings,
+                "cached": True,
+            }
+
+        ai_output = await _timed(
+            "generation", timings, assistant.complete(user_prompt, context)
+        )
+        if await disclaimer:
+            ai_output += assistant.disclaimer
+    except BaseException:
+        for task in (gate,) + speculative:
+            task.cancel()
+        raise
+
+    assistant.remember_answer(ai_output)
+    await asyncio.to_thread(assistant.cache_answer, user_prompt, chunk_ids, ai_output)
+    timings["total"] = time.perf_counter() - started
+    return {
+        "answer": ai_output,
+        "related": True,
+        "chunks": chunks,
+        "metas": metas,
+        "timings": timings,
+    }
+
+
+def _start_stages(assistant, user_prompt, retrieve, timings):
+    """
+    Starts the gate, retrieval and disclaimer check as concurrent tasks.
+
+    Cancelling an asyncio.to_thread task does not stop its thread: a Chroma query or spaCy
+    parse started for a prompt the gate then rejects still runs to completion in the
+    default executor. So retrieval and the disclaimer check wait for the local gate, which
+    decides most prompts in milliseconds, and are skipped when it rejects the prompt. When
+    the local gate is disabled or unsure they start at once, overlapping the LLM gate.
+    """
+    local = asyncio.get_running_loop().create_future()
+    gate = asyncio.create_task(
+        _timed("gate", timings, _run_gate(assistant, user_prompt, local))
+    )
+    retrieval = asyncio.create_task(
+        _threaded(local, "retrieval", timings, retrieve) if retrieve else _no_retrieval()
+    )
+    disclaimer = asyncio.create_task(
+        _threaded(
+            local, "disclaimer_check", timings, assistant.is_legal_or_financial, user_prompt
+        )
+    )
+    return gate, retrieval, disclaimer
+
+
+async def _run_gate(assistant, user_prompt, local):
+    """The topic gate; resolves `local` with the local gate's decision (None if unsure)."""
+    try:
+        decision = await assistant.local_gate_async(user_prompt)
+        local.set_result(decision)
+        if decision is not None:
+            return decision
+        return await assistant.llm_gate_async(user_prompt)
+    finally:
+        if not local.done():
+            # the gate failed or was cancelled: the turn ends, start nothing more
+            local.set_result("False")
+
+
+async def _threaded(local, stage, timings, func, *args):
+    """Runs func(*args) in a worker thread unless the local gate rejects the prompt."""
+    # shielded: cancelling this stage must not cancel the shared future
+    if await asyncio.shield(local) == "False":
+        return None
+    return await _timed(stage, timings, asyncio.to_thread(func, *args))
+
+
+async def stream_turn(
+    assistant: GHGAssistant,
+    user_prompt: str,
+    retrieve: Optional[Retrieve] = None,
+    format_context: FormatContext = _join_chunks,
+    turn: Optional[Dict[str, Any]] = None,
+):
+    """
+    Streaming version of run_turn: yields the answer text as the model produces it (the
+    disclaimer, if any, comes last) and records the final message in the conversation.
+    If a `turn` dict is passed it is filled with the same keys run_turn returns, plus a
+    "first_token" timing, once the stream ends.
+    """
+    turn = {} if turn is None else turn
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    gate, retrieval, disclaimer = _start_stages(assistant, user_prompt, retrieve, timings)
+    speculative = (retrieval, disclaimer)
+
+    try:
+        related = await gate
+        if related != "True":
+            for task in speculative:
+                task.cancel()
+            await asyncio.gather(*speculative, return_exceptions=True)
+            timings["first_token"] = timings["total"] = time.perf_counter() - started
+            turn.update(
+                answer=assistant.off_topic_message,
+                related=False,
+                chunks=[],
+                metas=[],
+                timings=timings,
+            )
+            yield assistant.off_topic_message
+            return
+
+        chunks, metas = await retrieval
+        context = format_context(chunks, metas)
+        chunk_ids = chunk_ids_of(metas)
+        cached = await asyncio.to_thread(assistant.cached_answer, user_prompt, chunk_ids)
+        if cached is not None:
+            assistant.remember_cached_answer(user_prompt, context, cached)
+            timings["first_token"] = timings["total"] = time.perf_counter() - started
+            turn.update(
+                answer=cached,
+                related=True,
+                chunks=chunks,
+                metas=metas,
+                timings=timings,
+                cached=True,
+            )
+            yield cached
+            return
+
+        parts: List[str] = []
+        generation_started = time.perf_counter()
+        async for token in assistant.stream_completion(user_prompt, context):
+            if not parts:
+                timings["first_token"] = time.perf_counter() - started
+            parts.append(token)
+            yield token
+        timings["generation"] = time.perf_counter() - generation_started
+        if await disclaimer:
+            parts.append(assistant.disclaimer)
+            yield assistant.disclaimer
+    finally:
+        for task in (gate,) + speculative:
+            task.cancel()
+
+    ai_output = "".join(parts)
+    assistant.remember_answer(ai_output)
+    await asyncio.to_thread(assistant.cache_answer, user_prompt, chunk_ids, ai_output)
+    timings["total"] = time.perf_counter() - started
+    turn.update(answer=ai_output, related=True, chunks=chunks, metas=metas, timings=timings)
+
+
+def chunk_ids_of(metas: List[Dict[str, Any]]) -> Optional[List[str]]:
+    """Chunk ids attached by rag_process.query_documents, or None if any is missing."""
+    ids = [meta.get("id") for meta in metas if meta]
+    if len(ids) != len(metas) or None in ids:
+        return None
+    return ids
+
+
+async def _no_retrieval() -> Tuple[List[str], List[Dict[str, Any]]]:
+    return [], []
@@ -0,0 +1,292 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional
+from pathlib import Path
+import argparse, asyncio, json, os, random, sys, tempfile, time
+
+import numpy as np
+
+# Load test for the RL + RAG pipeline against the local stub LLM (benchmarks/stub_llm.py).
+# N concurrent sessions each run `turns` questions through the real pipeline
+# (topic gate -> retrieval -> generation -> feedback); only the Groq API is replaced, so
+# the embedding model, spaCy model and Chroma index must already be on disk.
+#
+#   python src/benchmarks/load_test.py --sessions 20 --turns 5 --latency 0.3
+
+# Set Python path (same layout as src/app)
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.stub_llm import StubConfig, StubLLMServer
+
+STAGES = ["gate", "retrieval", "disclaimer_check", "generation", "feedback", "turn"]
+
+PROMPTS = [
+    "What are scope 1, scope 2 and scope 3 emissions?",
+    "How do we calculate scope 2 emissions from purchased electricity?",
+    "Which companies must report under the NGER scheme?",
+    "What does AASB S2 require us to disclose about climate risks?",
+    "How should we report fugitive methane emissions from gas processing?",
+    "What is the legal penalty for missing a climate disclosure deadline?",
+    "How much will emissions reporting cost us and should we budget for assurance?",
+    "Do carbon offsets count towards our net zero target?",
+    "What emission factors apply to our diesel fleet?",
+    "Thank you for your help",
+    "Give me a recipe for chocolate cake.",
+    "Write a Python script that sorts a list.",
+]
+
+COMPANIES = [
+    {"name": "Acme Mining", "sector": "Mining", "size": "Large"},
+    {"name": "Harbour Logistics", "sector": "Transport", "size": "Medium"},
+    {"name": "Green Grocers", "sector": "Retail", "size": "Small"},
+]
+
+
+# ---------- measurements ----------
+def _rss_bytes() -> Optional[int]:
+    """Current resident set size, where /proc is available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0}
+    ms = np.asarray(values, dtype=np.float64) * 1000.0
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "count": len(values),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(ms.max()),
+    }
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+        self.turns = 0
+        self.off_topic = 0
+        self.cached = 0
+        self.errors: Dict[str, int] = {}
+        self.rss_samples: List[int] = []
+
+    def add_turn(self, timings: Dict[str, float], turn: Dict[str, Any]) -> None:
+        self.turns += 1
+        self.off_topic += not turn.get("related", True)
+        self.cached += bool(turn.get("cached"))
+        for stage, seconds in timings.items():
+            if stage in self.samples:
+                self.samples[stage].append(seconds)
+
+    def add_error(self, error: BaseException) -> None:
+        name = type(error).__name__
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+    async def sample_memory(self, interval: float = 0.25) -> None:
+        while True:
+            rss = _rss_bytes()
+            if rss is not None:
+                self.rss_samples.append(rss)
+            await asyncio.sleep(interval)
+
+
+# ---------- load ----------
+async def run_session(pipeline, session_id: int, args, recorder: Recorder) -> None:
+    from backend.ghg_assistant import GHGAssistant
+
+    rng = random.Random(args.seed + session_id)
+    company = COMPANIES[session_id % len(COMPANIES)]
+    assistant = GHGAssistant(local_gate=args.local_gate, answer_cache=args.answer_cache)
+    assistant.set_context_form(json.dumps(company))
+
+    for _ in range(args.turns):
+        prompt = rng.choice(PROMPTS)
+        turn: Dict[str, Any] = {}
+        started = time.perf_counter()
+        try:
+            _, action, _, _, state = await pipeline.answer_async(
+                prompt, company, assistant=assistant, turn=turn
+            )
+            timings = dict(turn.get("timings", {}))
+            if turn.get("related"):
+                feedback_started = time.perf_counter()
+                pipeline.give_feedback(state, action, rng.choice([1.0, -1.0]))
+                timings["feedback"] = time.perf_counter() - feedback_started
+            timings["turn"] = time.perf_counter() - started
+            recorder.add_turn(timings, turn)
+        except Exception as error:
+            recorder.add_error(error)
+        if args.think_time:
+            await asyncio.sleep(rng.uniform(0, 2 * args.think_time))
+
+
+async def run_load(args) -> Dict[str, Any]:
+    from backend.pipeline import Pipeline
+    from backend.rl_agent import RLAgent
+
+    q_dir = tempfile.mkdtemp(prefix="ghg-load-test-")
+    startup = time.perf_counter()
+    agent = RLAgent(q_path=Path(q_dir) / "q_table.json", persistence=args.persistence)
+    pipeline = Pipeline(agent, n_results=args.n_results, stateless=False)
+    rss_after_startup = _rss_bytes()
+
+    # one untimed session so lazily loaded models (spaCy, MiniLM, Chroma) are warm
+    if args.warmup:
+        await run_session(pipeline, -1, argparse.Namespace(**{**vars(args), "turns": 1}), Recorder())
+    startup = time.perf_counter() - startup
+
+    recorder = Recorder()
+    sampler = asyncio.create_task(recorder.sample_memory())
+    started = time.perf_counter()
+    await asyncio.gather(*(run_session(pipeline, i, args, recorder) for i in range(args.sessions)))
+    wall = time.perf_counter() - started
+    sampler.cancel()
+
+    from backend.llm_scheduler import get_llm_scheduler
+
+    rss = recorder.rss_samples
+    return {
+        "config": {
+            key: vars(args)[key]
+            for key in (
+                "sessions", "turns", "think_time", "n_results", "local_gate", "answer_cache",
+                "latency", "jitter", "tokens_per_second", "completion_tokens", "error_rate",
+                "error_status", "rpm", "tpm", "max_concurrency", "persistence",
+            )
+        },
+        "startup_s": startup,
+        "wall_s": wall,
+        "turns": recorder.turns,
+        "off_topic_turns": recorder.off_topic,
+        "cached_turns": recorder.cached,
+        "errors": recorder.errors,
+        "throughput_turns_per_s": recorder.turns / wall if wall else 0.0,
+        "stages": {stage: percentiles(values) for stage, values in recorder.samples.items()},
+        "llm_scheduler": get_llm_scheduler().metrics(),
+        "memory_mb": {
+            "after_startup": (rss_after_startup or 0) / 2**20,
+            "mean": float(np.mean(rss)) / 2**20 if rss else None,
+            "max": max(rss) / 2**20 if rss else None,
+            "peak_rss": (_peak_rss_bytes() or 0) / 2**20,
+        },
+    }
+
+
+def print_report(report: Dict[str, Any], stub_counts: Dict[str, int]) -> None:
+    print(f"\nsessions={report['config']['sessions']} turns/session={report['config']['turns']}")
+    print(
+        f"wall {report['wall_s']:.2f}s, startup {report['startup_s']:.2f}s, "
+        f"{report['turns']} turns ({report['off_topic_turns']} off topic, "
+        f"{report['cached_turns']} cached), "
+        f"{report['throughput_turns_per_s']:.2f} turns/s"
+    )
+    print(f"errors: {report['errors'] or 'none'}   stub: {stub_counts}")
+    print(f"\n{'stage':<18}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for stage, stats in report["stages"].items():
+        if not stats["count"]:
+            continue
+        print(
+            f"{stage:<18}{stats['count']:>6}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}"
+            f"{stats['p99_ms']:>10.1f}{stats['max_ms']:>10.1f}"
+        )
+    scheduler = report["llm_scheduler"]
+    print(
+        f"\nLLM scheduler: {scheduler['submitted']} requests, {scheduler['deduplicated']} "
+        f"deduplicated, {scheduler['retries']} retries ({scheduler['rate_limited']} rate "
+        f"limited), max queue depth {scheduler['max_queue_depth']}"
+    )
+    for name, wait in scheduler["wait"].items():
+        print(f"  {name:<16}queue wait mean {wait['mean_ms']:.1f} ms, p95 {wait['p95_ms']:.1f} ms")
+    memory = report["memory_mb"]
+    print(
+        f"\nmemory: {memory['after_startup']:.0f} MB after startup, "
+        f"max {memory['max'] or 0:.0f} MB during load, peak RSS {memory['peak_rss']:.0f} MB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline load test of the RL + RAG pipeline")
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent chat sessions")
+    parser.add_argument("--turns", type=int, default=5, help="questions per session")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between turns (s)")
+    parser.add_argument("--n-results", type=int, default=4)
+    parser.add_argument("--no-local-gate", dest="local_gate", action="store_false",
+                        help="send every gate decision to the (stub) LLM")
+    parser.add_argument("--answer-cache", action="store_true",
+                        help="keep the semantic answer cache on (off by default so repeated "
+                             "prompts still reach the LLM)")
+    parser.add_argument("--persistence", choices=["json", "wal", "sqlite"], default="json",
+                        help="RLAgent Q-table persistence mode")
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stub-url", help="use an already running stub instead of starting one")
+    parser.add_argument("--latency", type=float, default=StubConfig.latency)
+    parser.add_argument("--jitter", type=float, default=StubConfig.jitter)
+    parser.add_argument("--tokens-per-second", type=float, default=StubConfig.tokens_per_second)
+    parser.add_argument("--completion-tokens", type=int, default=StubConfig.completion_tokens)
+    parser.add_argument("--error-rate", type=float, default=StubConfig.error_rate)
+    parser.add_argument("--error-status", type=int, default=StubConfig.error_status)
+    parser.add_argument("--rpm", type=float, default=0, help="LLM requests/min limit (0 = none)")
+    parser.add_argument("--tpm", type=float, default=0, help="LLM tokens/min limit (0 = none)")
+    parser.add_argument("--max-concurrency", type=int, default=8, help="LLM requests in flight")
+    parser.add_argument("--json", type=Path, help="also write the report to this file")
+    args = parser.parse_args()
+
+    server = None
+    if args.stub_url:
+        base_url = args.stub_url
+    else:
+        server = StubLLMServer(
+            StubConfig(
+                latency=args.latency,
+                jitter=args.jitter,
+                tokens_per_second=args.tokens_per_second,
+                completion_tokens=args.completion_tokens,
+                error_rate=args.error_rate,
+                error_status=args.error_status,
+                seed=args.seed,
+            )
+        ).start()
+        base_url = server.base_url
+
+    # everything stays on this machine: the Groq SDK talks to the stub, models load from
+    # the local Hugging Face cache and Chroma telemetry is off
+    os.environ["GROQ_BASE_URL"] = base_url
+    os.environ.setdefault("GROQ_API_KEY", "stub")
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+    os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+    # limits of the shared LLM scheduler (read when backend.llm_scheduler is imported)
+    os.environ["GROQ_REQUESTS_PER_MINUTE"] = str(args.rpm)
+    os.environ["GROQ_TOKENS_PER_MINUTE"] = str(args.tpm)
+    os.environ["GROQ_MAX_CONCURRENCY"] = str(args.max_concurrency)
+
+    try:
+        report = asyncio.run(run_load(args))
+    finally:
+        if server is not None:
+            server.stop()
+
+    print_report(report, server.config.counts if server else {})
+    if args.json:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
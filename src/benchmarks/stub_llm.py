@@ -0,0 +1,243 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse, itertools, json, random, re, threading, time
+
+# Local stand-in for the Groq (OpenAI-compatible) chat completions API, for load tests
+# that must not touch the network. Point the groq SDK at it with
+#   GROQ_BASE_URL=http://127.0.0.1:<port>  GROQ_API_KEY=<anything>
+
+_GATE_MARKER = "Limit your answer to True or False"
+_GHG_WORDS = re.compile(
+    r"\b(?:ghg|emission|carbon|co2|climate|scope|nger|aasb|safeguard|net zero|offset|"
+    r"disclos|report|sustainab|hello|hi|thank|goodbye)",
+    re.IGNORECASE,
+)
+_WORDS = (
+    "Scope 1 emissions are direct emissions from owned or controlled sources while scope 2 "
+    "covers purchased electricity and scope 3 the rest of the value chain under the GHG "
+    "Protocol so companies should collect activity data apply emission factors and report "
+    "the totals with their methodology and assumptions"
+).split()
+
+
+@dataclass
+class StubConfig:
+    """
+    latency:           seconds before the first token (mean, uniformly +/- `jitter`)
+    tokens_per_second: output rate after the first token
+    completion_tokens: tokens per generated answer (gate answers are one token)
+    error_rate:        fraction of requests answered with `error_status`
+    retry_after:       Retry-After header (seconds) sent with 429 errors
+    """
+    latency: float = 0.3
+    jitter: float = 0.1
+    tokens_per_second: float = 250.0
+    completion_tokens: int = 200
+    error_rate: float = 0.0
+    error_status: int = 429
+    retry_after: float = 1.0
+    seed: Optional[int] = None
+    counts: Dict[str, int] = field(default_factory=dict)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+    server: "StubLLMServer"
+
+    def log_message(self, format, *args):  # quiet
+        pass
+
+    def do_POST(self):
+        config = self.server.config
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "invalid JSON"}})
+            return
+
+        if self.server.draw() < config.error_rate:
+            self.server.count("errors")
+            headers = {}
+            if config.error_status == 429:
+                headers["Retry-After"] = str(config.retry_after)
+            self._send_json(
+                config.error_status,
+                {"error": {"message": "injected error", "type": "stub_error"}},
+                headers,
+            )
+            return
+
+        is_gate = _is_gate(request.get("messages") or [])
+        tokens = _gate_answer(request) if is_gate else _answer_tokens(config.completion_tokens)
+        self.server.count("gate_requests" if is_gate else "generation_requests")
+        time.sleep(max(0.0, config.latency + config.jitter * (2 * self.server.draw() - 1)))
+
+        if request.get("stream"):
+            self._stream(request, tokens)
+        else:
+            time.sleep(max(0, len(tokens) - 1) / config.tokens_per_second)
+            self._send_json(200, _completion(request, "".join(tokens), len(tokens)))
+
+    # ---------- responses ----------
+    def _send_json(self, status: int, payload: Dict[str, Any], headers=None) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, request: Dict[str, Any], tokens: List[str]) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        completion_id = f"chatcmpl-stub-{next(_ids)}"
+        interval = 1.0 / self.server.config.tokens_per_second
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(interval)
+            delta = {"role": "assistant", "content": token} if i == 0 else {"content": token}
+            self._write_event(_chunk(request, completion_id, delta, None))
+        self._write_event(_chunk(request, completion_id, {}, "stop"))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _write_event(self, payload: Dict[str, Any]) -> None:
+        self._write_chunk(b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n")
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    """Threaded HTTP server answering /openai/v1/chat/completions (plain and streaming)."""
+
+    daemon_threads = True
+
+    def __init__(self, config: Optional[StubConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.config = config or StubConfig()
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def draw(self) -> float:
+        with self._lock:
+            return self._random.random()
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.config.counts[name] = self.config.counts.get(name, 0) + 1
+
+    def start(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="stub-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+# ---------- payload helpers ----------
+_ids = itertools.count()
+
+
+def _is_gate(messages: List[Dict[str, Any]]) -> bool:
+    return any(
+        m.get("role") == "system" and _GATE_MARKER in (m.get("content") or "") for m in messages
+    )
+
+
+def _gate_answer(request: Dict[str, Any]) -> List[str]:
+    users = [m for m in request.get("messages") or [] if m.get("role") == "user"]
+    text = (users[-1].get("content") or "") if users else ""
+    return ["True" if _GHG_WORDS.search(text) else "False"]
+
+
+def _answer_tokens(n: int) -> List[str]:
+    return [(" " if i else "") + _WORDS[i % len(_WORDS)] for i in range(max(1, n))]
+
+
+def _completion(request: Dict[str, Any], content: str, n_tokens: int) -> Dict[str, Any]:
+    prompt_tokens = sum(len(m.get("content") or "") for m in request.get("messages") or []) // 4
+    return {
+        "id": f"chatcmpl-stub-{next(_ids)}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "stub"),
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+                "logprobs": None,
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": n_tokens,
+            "total_tokens": prompt_tokens + n_tokens,
+        },
+    }
+
+
+def _chunk(request, completion_id, delta, finish_reason) -> Dict[str, Any]:
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": request.get("model", "stub"),
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason, "logprobs": None}],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local Groq/OpenAI-compatible stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=StubConfig.latency)
+    parser.add_argument("--jitter", type=float, default=StubConfig.jitter)
+    parser.add_argument("--tokens-per-second", type=float, default=StubConfig.tokens_per_second)
+    parser.add_argument("--completion-tokens", type=int, default=StubConfig.completion_tokens)
+    parser.add_argument("--error-rate", type=float, default=StubConfig.error_rate)
+    parser.add_argument("--error-status", type=int, default=StubConfig.error_status)
+    parser.add_argument("--retry-after", type=float, default=StubConfig.retry_after)
+    args = parser.parse_args()
+
+    config = StubConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        retry_after=args.retry_after,
+    )
+    server = StubLLMServer(config, args.host, args.port)
+    print(f"Stub LLM listening on {server.base_url} (set GROQ_BASE_URL to this)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
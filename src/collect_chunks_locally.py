@@ -67,7 +67,8 @@ for pdf in sorted(data_dir.glob("*.pdf")):
             })
 
 if docs:
-    embs = model.encode(docs, batch_size=64, convert_to_numpy=True).tolist()
+    # keep one contiguous float32 matrix; Chroma takes NumPy rows directly
+    embs = model.encode(docs, batch_size=64, convert_to_numpy=True).astype("float32", copy=False)
 
     batch_size = 1000
     for i in range(0, len(docs), batch_size):
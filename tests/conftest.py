@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# backend modules are imported as `backend.<module>` with src/ on the path, as in the app
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
@@ -0,0 +1,58 @@
+import numpy as np
+
+from backend.answer_cache import SemanticAnswerCache, context_key
+
+KEY = context_key("company", ["c2", "c1"])
+
+
+def vec(*values):
+    return np.array(values, dtype=np.float32)
+
+
+def test_context_key_ignores_chunk_order_but_not_company():
+    assert KEY == context_key("company", ["c1", "c2"])
+    assert KEY != context_key("other company", ["c1", "c2"])
+    assert KEY != context_key("company", ["c1"])
+
+
+def test_near_identical_question_hits_within_its_partition():
+    cache = SemanticAnswerCache(similarity_threshold=0.9)
+    cache.store(vec(1, 0), KEY, "answer")
+    assert cache.lookup(vec(1, 0.1), KEY) == "answer"        # cosine ~0.995
+    assert cache.lookup(vec(1, 1), KEY) is None              # cosine ~0.71
+    assert cache.lookup(vec(1, 0), context_key(None, [])) is None
+    metrics = cache.metrics()
+    assert (metrics["hits"], metrics["misses"]) == (1, 2)
+
+
+def test_best_match_wins():
+    cache = SemanticAnswerCache(similarity_threshold=0.5)
+    cache.store(vec(1, 0), KEY, "x axis")
+    cache.store(vec(0, 1), KEY, "y axis")
+    assert cache.lookup(vec(0.2, 1), KEY) == "y axis"
+
+
+def test_entries_expire_and_lru_is_evicted(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr("backend.answer_cache.time.monotonic", lambda: clock[0])
+    cache = SemanticAnswerCache(max_entries=2, ttl_seconds=10)
+    cache.store(vec(1, 0, 0), KEY, "a")
+    cache.store(vec(0, 1, 0), KEY, "b")
+    assert cache.lookup(vec(1, 0, 0), KEY) == "a"   # "b" is now least recently used
+    cache.store(vec(0, 0, 1), KEY, "c")
+    assert cache.lookup(vec(0, 1, 0), KEY) is None
+
+    clock[0] = 11.0
+    assert cache.lookup(vec(1, 0, 0), KEY) is None
+    assert cache.metrics()["evicted"] == 1
+    assert cache.metrics()["expired"] == 2
+
+
+def test_collection_version_change_clears_the_cache():
+    version = [1]
+    cache = SemanticAnswerCache(version_source=lambda: version[0], version_check_interval=0)
+    cache.store(vec(1, 0), KEY, "answer")
+    assert cache.lookup(vec(1, 0), KEY) == "answer"
+    version[0] = 2
+    assert cache.lookup(vec(1, 0), KEY) is None
+    assert cache.metrics()["invalidations"] == 1
@@ -0,0 +1,65 @@
+import backend.context_packing as context_packing
+from backend.context_packing import _overlap, pack_context
+
+
+def meta(number, distance=None, source="doc.pdf"):
+    return {"source": source, "chunk_number": number, "distance": distance}
+
+
+def test_overlap_finds_long_and_short_shared_text():
+    shared = "Scope 2 covers purchased electricity. "
+    assert _overlap("Intro sentence. " + shared, shared + "Next.") == len(shared)
+    assert _overlap("First part. It is. ", "It is. Second part.") == len("It is. ")
+    assert _overlap("Ends with the", "end of the story.") == 0
+    assert _overlap("No shared text.", "Something else.") == 0
+
+
+def test_adjacent_chunks_are_merged_once():
+    texts, metas = pack_context(
+        ["One. Two. ", "Two. Three.", "Unrelated."],
+        [meta(0, 0.2), meta(1, 0.1), meta(5, 0.3)],
+        count_tokens=len,
+    )
+    assert texts == ["One. Two. Three.", "Unrelated."]
+    assert metas[0]["chunk_numbers"] == [0, 1]
+    assert "chunk_numbers" not in metas[1]
+
+
+def test_chunks_without_shared_text_are_joined_by_a_newline():
+    texts, _ = pack_context(["First.", "Second."], [meta(0), meta(1)], count_tokens=len)
+    assert texts == ["First.\nSecond."]
+
+
+def test_contained_passages_are_dropped():
+    texts, _ = pack_context(
+        ["Scope 1 and scope 2 emissions.", "scope 2"],
+        [meta(0, 0.5, "a.pdf"), meta(0, 0.1, "b.pdf")],
+        count_tokens=len,
+    )
+    assert texts == ["Scope 1 and scope 2 emissions."]
+
+
+def test_passages_are_packed_best_first_within_the_budget():
+    count = len  # one token per character
+    texts, metas = pack_context(
+        ["a" * 6, "b" * 5, "c" * 3],
+        [meta(0, 0.3, "a"), meta(0, 0.1, "b"), meta(0, 0.2, "c")],
+        token_budget=9,
+        count_tokens=count,
+    )
+    assert texts == ["b" * 5, "c" * 3]
+    assert [m["source"] for m in metas] == ["b", "c"]
+
+
+def test_best_passage_over_budget_is_truncated():
+    texts, _ = pack_context(["x" * 100], [meta(0)], token_budget=10, count_tokens=len)
+    assert texts == ["x" * 10]
+
+
+def test_default_budget_uses_the_shared_token_counter(monkeypatch):
+    monkeypatch.setattr(context_packing, "get_token_counter", lambda: lambda text: 10)
+    texts, _ = pack_context(
+        ["a", "b", "c"], [meta(0, source="a"), meta(0, source="b"), meta(0, source="c")],
+        token_budget=25,
+    )
+    assert len(texts) == 2
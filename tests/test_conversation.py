@@ -0,0 +1,84 @@
+from backend.conversation import ConversationMemory, extractive_summary, tokenizer_counter
+
+
+def words(text):
+    return len(text.split())
+
+
+def memory(**kw):
+    kw.setdefault("count_tokens", words)
+    return ConversationMemory("system prompt", **kw)
+
+
+def turn(mem, question, answer, context="retrieved context"):
+    mem.add_turn(question, context)
+    mem.add_answer(answer)
+
+
+def contents(messages):
+    return [m["content"] for m in messages]
+
+
+def test_company_context_is_replaced_not_appended():
+    mem = memory()
+    mem.set_company_context("company one")
+    mem.set_company_context("company two")
+    assert contents(mem.messages) == ["system prompt", "company two"]
+
+
+def test_only_the_latest_retrieved_context_is_kept():
+    mem = memory()
+    turn(mem, "q1", "a1", context="old context")
+    mem.add_turn("q2", "new context")
+    assert contents(mem.messages) == ["system prompt", "q1", "a1", "new context", "q2"]
+
+
+def test_old_turns_are_dropped_or_summarised():
+    mem = memory(max_stored_turns=2)
+    for i in range(1, 4):
+        turn(mem, f"Question {i}. More detail.", f"a{i}")
+    assert "Question 1. More detail." not in contents(mem.messages)
+
+    summarised = memory(max_stored_turns=2, summarize=extractive_summary)
+    for i in range(1, 5):
+        turn(summarised, f"Question {i}. More detail.", f"a{i}")
+    summary = summarised.messages[1]["content"]
+    assert summary.endswith("Question 1.; Question 2.")
+
+
+def test_prompt_keeps_recent_history_within_the_budget():
+    mem = memory(token_budget=12, history_turns=5)
+    for i in range(1, 4):
+        turn(mem, f"question {i}", f"answer {i}")
+    mem.add_turn("question 4", "ctx")
+    # 2 (system) + 1 (context) + 2 (question 4) leave room for one exchange of 2 + 2 tokens
+    assert contents(mem.prompt_messages()) == [
+        "system prompt", "question 3", "answer 3", "ctx", "question 4",
+    ]
+    assert mem.prompt_tokens() <= 12
+
+
+def test_prompt_tokens_stay_bounded_over_a_long_session():
+    mem = memory(token_budget=50)
+    for i in range(200):
+        turn(mem, f"question number {i}", "a fairly long answer " * 5, context="context " * 10)
+    mem.add_turn("last question", "context " * 10)
+    assert mem.prompt_tokens() <= 50
+    assert len(mem.messages) <= 2 * 20 + 3
+
+
+def test_oversized_context_is_truncated():
+    mem = memory(token_budget=10)
+    mem.add_turn("the question", "word " * 40)
+    messages = mem.prompt_messages()
+    assert contents(messages)[-1] == "the question"
+    assert mem.prompt_tokens() <= 10
+
+
+def test_tokenizer_counter_excludes_special_tokens():
+    class FakeTokenizer:
+        def encode(self, text, add_special_tokens=True):
+            ids = text.split()
+            return ["[CLS]"] + ids + ["[SEP]"] if add_special_tokens else ids
+
+    assert tokenizer_counter(FakeTokenizer())("three word text") == 3
@@ -0,0 +1,48 @@
+import time
+
+import numpy as np
+
+from backend.embedding_cache import EmbeddingCache
+
+
+def last_used(cache):
+    return dict(cache._conn.execute("SELECT key, last_used FROM embeddings").fetchall())
+
+
+def test_round_trip_and_hit_rate(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.sqlite")
+    cache.put_many("m", ["a  b", "c"], np.array([[1, 2], [3, 4]], dtype=np.float32))
+
+    a, missing, c = cache.get_many("m", ["a b", "x", "c"])
+    np.testing.assert_array_equal(a, [1, 2])
+    np.testing.assert_array_equal(c, [3, 4])
+    assert missing is None
+    assert cache.hit_rate() == 2 / 3
+    cache.close()
+
+
+def test_hits_are_written_in_batches(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.sqlite", touch_every=3)
+    cache.put_many("m", ["a", "b", "c"], np.zeros((3, 2), dtype=np.float32))
+    before = last_used(cache)
+
+    cache.get_many("m", ["a", "b"])
+    assert last_used(cache) == before
+
+    cache.get_many("m", ["c"])
+    assert all(ts >= before[k] for k, ts in last_used(cache).items())
+    assert not cache._touched
+    cache.close()
+
+
+def test_eviction_sees_buffered_hits(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.sqlite", max_entries=2, evict_every=1)
+    cache.put_many("m", ["old"], np.zeros((1, 2), dtype=np.float32))
+    cache.put_many("m", ["newer"], np.zeros((1, 2), dtype=np.float32))
+    time.sleep(0.01)
+    cache.get_many("m", ["old"])  # "old" is now the most recently used
+
+    cache.put_many("m", ["newest"], np.zeros((1, 2), dtype=np.float32))
+    old, newer, newest = cache.get_many("m", ["old", "newer", "newest"])
+    assert old is not None and newer is None and newest is not None
+    cache.close()
@@ -0,0 +1,32 @@
+import pytest
+
+spacy = pytest.importorskip("spacy")
+pytest.importorskip("groq")
+if not spacy.util.is_package("en_core_web_md"):
+    pytest.skip("en_core_web_md is not installed", allow_module_level=True)
+
+from backend.ghg_assistant import GHGAssistant  # noqa: E402
+
+PROMPTS = [
+    "What are scope 1 emissions?",
+    "Can the company be sued if our audit misses fugitive methane?",
+    "How much tax do we pay on diesel?",
+    "Explain the GHG Protocol.",
+    "Our revenue is $20 million; are we a large entity under AASB S2?",
+    "",
+]
+
+
+@pytest.fixture(scope="module")
+def assistant():
+    return GHGAssistant(local_gate=False, answer_cache=False, count_tokens=len)
+
+
+def test_batch_matches_per_prompt_classification(assistant):
+    expected = [assistant.is_legal_or_financial(p) for p in PROMPTS]
+    assert assistant.classify_legal_or_financial(PROMPTS, batch_size=2) == expected
+    assert any(expected) and not all(expected)
+
+
+def test_batch_of_nothing(assistant):
+    assert assistant.classify_legal_or_financial([]) == []
@@ -0,0 +1,206 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from backend.llm_scheduler import GATE, GENERATION, LLMScheduler, RateLimits, TokenBucket
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.chunks:
+            raise StopAsyncIteration
+        return self.chunks.pop(0)
+
+    async def close(self):
+        self.closed = True
+
+
+class APIError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        headers = {} if retry_after is None else {"retry-after": str(retry_after)}
+        self.response = SimpleNamespace(headers=headers)
+
+
+class FakeClient:
+    """chat.completions.create that records calls and can fail or stall first."""
+
+    def __init__(self, failures=(), delay=0.0):
+        self.failures = list(failures)
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self.streams = []
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, stream=False, **request):
+        with self._lock:
+            self.calls.append(request)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.failures:
+                raise self.failures.pop(0)
+            if stream:
+                self.streams.append(FakeStream(["a", "b", "c"]))
+                return self.streams[-1]
+            return SimpleNamespace(content=request["messages"][-1]["content"], usage=None)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def scheduler(client, **kwargs):
+    kwargs.setdefault("limits", RateLimits(0, 0))
+    return LLMScheduler(client_factory=lambda: client, base_delay=0.001, max_delay=0.01, **kwargs)
+
+
+def request(text="hi", **extra):
+    return dict(messages=[{"role": "user", "content": text}], model="m", **extra)
+
+
+# ---------- token buckets ----------
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(per_minute=60)  # one token per second
+    assert bucket.wait_time(10) == 0.0
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0, abs=0.05)
+    bucket.give_back(30)
+    assert bucket.wait_time(30) == pytest.approx(0.0, abs=0.05)
+
+
+def test_token_bucket_caps_oversized_requests_and_disables_at_zero():
+    bucket = TokenBucket(per_minute=60)
+    bucket.take(1000)  # never more than the capacity
+    assert bucket.wait_time(1000) == pytest.approx(60.0, abs=0.05)
+    unlimited = TokenBucket(per_minute=0)
+    unlimited.take(10**9)
+    assert unlimited.wait_time(10**9) == 0.0
+
+
+def test_rate_limits_pause_delays_admission():
+    limits = RateLimits(0, 0)
+    limits.pause(5)
+    assert limits.wait_time(1) == pytest.approx(5.0, abs=0.05)
+
+
+# ---------- retries ----------
+def test_retries_429_and_5xx_then_succeeds():
+    client = FakeClient(failures=[APIError(429, retry_after=0), APIError(503)])
+    s = scheduler(client)
+    response = asyncio.run(s.chat(GENERATION, **request("x")))
+    assert response.content == "x"
+    assert len(client.calls) == 3
+    m = s.metrics()
+    assert (m["retries"], m["rate_limited"], m["completed"], m["in_flight"]) == (2, 1, 1, 0)
+
+
+def test_gives_up_after_max_retries():
+    client = FakeClient(failures=[APIError(500)] * 5)
+    s = scheduler(client, max_retries=2)
+    with pytest.raises(APIError):
+        asyncio.run(s.chat(GENERATION, **request()))
+    assert len(client.calls) == 3
+    assert s.metrics()["failed"] == 1 and s.metrics()["in_flight"] == 0
+
+
+def test_client_errors_are_not_retried():
+    client = FakeClient(failures=[APIError(400)])
+    s = scheduler(client)
+    with pytest.raises(APIError):
+        asyncio.run(s.chat(GENERATION, **request()))
+    assert len(client.calls) == 1
+
+
+def test_backoff_is_capped_full_jitter(monkeypatch):
+    bounds = []
+    monkeypatch.setattr("backend.llm_scheduler.random.uniform", lambda a, b: bounds.append(b) or 0.0)
+    client = FakeClient(failures=[APIError(502)] * 4)
+    s = LLMScheduler(RateLimits(0, 0), client_factory=lambda: client, base_delay=1.0, max_delay=3.0)
+    asyncio.run(s.chat(GENERATION, **request()))
+    assert bounds == [1.0, 2.0, 3.0, 3.0]
+
+
+# ---------- admission ----------
+def test_gate_requests_are_admitted_before_queued_generations():
+    client = FakeClient(delay=0.01)
+    s = scheduler(client, max_concurrency=1)
+
+    async def main():
+        first = asyncio.create_task(s.chat(GENERATION, **request("g0")))
+        await asyncio.sleep(0)  # g0 takes the only slot
+        generations = [asyncio.create_task(s.chat(GENERATION, **request(f"g{i}"))) for i in (1, 2)]
+        await asyncio.sleep(0)
+        gate = asyncio.create_task(s.chat(GATE, **request("gate")))
+        await asyncio.gather(first, gate, *generations)
+
+    asyncio.run(main())
+    assert [c["messages"][0]["content"] for c in client.calls] == ["g0", "gate", "g1", "g2"]
+
+
+def test_identical_requests_share_one_call_across_event_loops():
+    client = FakeClient(delay=0.2)
+    s = scheduler(client)
+    results = []
+
+    def worker():
+        results.append(asyncio.run(s.chat(GENERATION, **request("same"))).content)
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for t in threads:
+        t.start()
+        time.sleep(0.02)
+    for t in threads:
+        t.join()
+    assert results == ["same"] * 3
+    assert len(client.calls) == 1
+    assert s.metrics()["deduplicated"] == 2
+
+
+def test_concurrency_limit_is_shared_across_event_loops():
+    client = FakeClient(delay=0.05)
+    s = scheduler(client, max_concurrency=2)
+
+    def worker(i):
+        async def run():
+            await asyncio.gather(*(s.chat(GENERATION, **request(f"{i}-{j}")) for j in range(3)))
+        asyncio.run(run())
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(client.calls) == 9
+    assert client.max_active == 2
+    assert s.metrics()["in_flight"] == 0
+
+
+def test_stream_is_closed_when_the_consumer_stops_early():
+    client = FakeClient()
+    s = scheduler(client)
+
+    async def main():
+        stream = s.chat_stream(GENERATION, **request())
+        async for chunk in stream:
+            assert chunk == "a"
+            break
+        await stream.aclose()
+
+    asyncio.run(main())
+    assert client.streams[0].closed
+    assert s.metrics()["in_flight"] == 0
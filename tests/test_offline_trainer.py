@@ -0,0 +1,87 @@
+import json
+import random
+
+import numpy as np
+import pytest
+
+from backend.offline_trainer import encode_events, load_logs, replay, replay_score, sweep, train
+from backend.q_store import QStore
+from backend.rl_agent import DEFAULT_ACTIONS, RLAgent
+from backend.state import encode_state
+
+PROMPTS = [
+    "How do we report scope 3 emissions?",
+    "What does the NGER scheme require?",
+    "Which penalties apply for late disclosure?",
+]
+COMPANY = {"sector": "mining", "size": "large"}
+
+
+def events(n, seed=0):
+    rng = random.Random(seed)
+    return [
+        {
+            "ts": f"2025-{rng.randint(1, 12):02d}-01T00:00:00",
+            "prompt": rng.choice(PROMPTS),
+            "company": COMPANY,
+            "action": rng.choice(DEFAULT_ACTIONS),
+            "reward": rng.choice([1.0, -1.0, 0.5]),
+        }
+        for _ in range(n)
+    ]
+
+
+def test_replay_matches_sequential_agent_updates(tmp_path):
+    records = events(300)
+    agent = RLAgent(alpha=0.3, q_path=tmp_path / "q_table.json", persistence="wal")
+    for r in records:
+        state = encode_state(r["prompt"], r["company"])
+        state["month"] = r["ts"][:7]
+        agent.update(state, r["action"], r["reward"])
+
+    log = encode_events(records, QStore(DEFAULT_ACTIONS))
+    table = train(log, alpha=0.3)
+    for key, q in table.items():
+        expected = agent.q_for(json.loads(key))
+        assert q == pytest.approx(expected, abs=1e-6)
+    agent.close()
+
+
+def test_replay_applies_updates_in_log_order():
+    q0 = np.zeros((1, 2))
+    q = replay(q0, np.array([0, 0]), np.array([1, 1]), np.array([1.0, 0.0]), alpha=0.5)
+    # 0 -> 0.5 (reward 1) -> 0.25 (reward 0)
+    assert q.tolist() == [[0.0, 0.25]]
+    assert q0.tolist() == [[0.0, 0.0]]
+
+
+def test_replay_score_weights_events_by_policy_probability():
+    q = np.array([[1.0, 0.0]])
+    states, actions, rewards = np.array([0, 0]), np.array([0, 1]), np.array([1.0, -1.0])
+    assert replay_score(q, states, actions, rewards, epsilon=0.0) == 1.0
+    assert replay_score(q, states, actions, rewards, epsilon=1.0) == 0.0
+
+
+def test_sweep_ranks_configurations_in_process():
+    log = encode_events(events(200), QStore(DEFAULT_ACTIONS))
+    grid = [{"alpha": a, "epsilon": 0.1} for a in (0.1, 0.5)]
+    results = sweep(log, grid, workers=1)
+    assert sorted(r["alpha"] for r in results) == [0.1, 0.5]
+    assert results[0]["score"] >= results[1]["score"]
+
+
+def test_skipped_events_are_counted_and_an_unusable_log_fails():
+    records = events(3) + [{"ts": "2025-10-01", "action": "broad", "tag": "up"}]
+    assert encode_events(records, QStore(DEFAULT_ACTIONS)).skipped == 1
+
+    with pytest.raises(ValueError, match="all 2 logged events were skipped"):
+        encode_events(
+            [{"ts": "2025-10-01", "action": "broad", "tag": "up"}] * 2, QStore(DEFAULT_ACTIONS)
+        )
+
+
+def test_csv_logs_are_rejected(tmp_path):
+    path = tmp_path / "rl_logs.csv"
+    path.write_text("ts,action,tag\n2025-10-01,broad,up\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="expected a .jsonl"):
+        load_logs([path])
@@ -0,0 +1,119 @@
+import json
+import threading
+
+import numpy as np
+import pytest
+
+from backend.q_log import QUpdateLog
+from backend.rl_agent import RLAgent
+
+STATE = {"len": "short", "month": "2025-10", "sector": "mining", "size": "large", "topic": "scope"}
+OTHER = dict(STATE, sector="energy")
+
+
+@pytest.fixture
+def q_path(tmp_path):
+    return tmp_path / "q_table.json"
+
+
+def agent(q_path, **kw):
+    return RLAgent(actions=["a", "b"], q_path=q_path, persistence="wal", **kw)
+
+
+def test_updates_are_replayed_from_the_log(q_path):
+    first = agent(q_path)
+    first.update(STATE, "a", 1.0)
+    first.update(STATE, "a", 1.0)
+    first.update(OTHER, "b", -1.0)
+    first.close()
+
+    second = agent(q_path)
+    assert second.q_for(STATE) == first.q_for(STATE)
+    assert second.q_for(OTHER) == first.q_for(OTHER)
+    second.close()
+
+
+def test_compaction_writes_a_snapshot_and_truncates_the_log(q_path):
+    first = agent(q_path)
+    first._log.compact_after = 3
+    for _ in range(3):
+        first.update(STATE, "a", 1.0)
+    first.update(OTHER, "b", 0.5)
+    first._log.flush()
+
+    log = first._log
+    assert log.snapshot_path.exists()
+    # only the records after the last snapshot are left in the log
+    assert len(log.wal_path.read_text(encoding="utf-8").splitlines()) == 1
+    expected = {"state": first.q_for(STATE), "other": first.q_for(OTHER)}
+    first.close()
+
+    second = agent(q_path)
+    assert second.q_for(STATE) == expected["state"]
+    assert second.q_for(OTHER) == expected["other"]
+    second.close()
+
+
+def test_snapshot_is_json_ids_plus_npy_values(q_path):
+    log = QUpdateLog(q_path)
+    log.load(dict)
+    values = np.array([[0.1, 0.2]], dtype=np.float32)
+    log.compact(["a", "b"], [tuple(STATE[k] for k in sorted(STATE))], values, wait=True)
+    log.close()
+
+    with log.snapshot_path.open("rb") as f:
+        assert f.readline() == b"QSNAP2\n"
+        ids = json.loads(f.readline())
+        assert ids == {"actions": ["a", "b"], "states": [json.dumps(STATE, sort_keys=True)]}
+        np.testing.assert_array_equal(np.load(f, allow_pickle=False), values)
+
+    assert QUpdateLog(q_path)._read_snapshot() == {
+        json.dumps(STATE, sort_keys=True): {"a": 0.1, "b": 0.2}
+    }
+
+
+def test_torn_last_record_is_ignored(q_path):
+    log = QUpdateLog(q_path)
+    log.load(dict)
+    log.append("s", "a", 1.0)
+    log.close()
+    with log.wal_path.open("a", encoding="utf-8") as f:
+        f.write('["s", "a", 2.')
+
+    reopened = QUpdateLog(q_path)
+    assert reopened.load(dict) == {"s": {"a": 1.0}}
+    reopened.close()
+
+
+def run_with_timeout(func, *args, **kw):
+    # a regression would block forever; fail the test instead
+    outcome = {}
+
+    def target():
+        try:
+            func(*args, **kw)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive(), f"{func.__name__} blocked"
+    return outcome.get("error")
+
+
+def test_writer_failure_is_raised_instead_of_hanging(q_path, monkeypatch):
+    log = QUpdateLog(q_path)
+    log.load(dict)
+
+    def disk_full(*args):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(log, "_write_snapshot", disk_full)
+    error = run_with_timeout(log.compact, ["a"], [], np.zeros((0, 1), np.float32), wait=True)
+    assert isinstance(error, RuntimeError) and isinstance(error.__cause__, OSError)
+
+    assert isinstance(run_with_timeout(log.flush), RuntimeError)
+    with pytest.raises(RuntimeError):
+        log.append("s", "a", 1.0)
+    log.close()
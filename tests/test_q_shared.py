@@ -0,0 +1,64 @@
+import threading
+
+import pytest
+
+from backend.q_shared import SharedQTable
+from backend.rl_agent import RLAgent
+from backend.state import state_key
+
+STATE = {"len": "short", "month": "2025-10", "sector": "mining", "size": "large", "topic": "scope"}
+
+
+def agent(q_path):
+    return RLAgent(actions=["a", "b"], alpha=0.5, q_path=q_path, persistence="sqlite",
+                   max_staleness=0.0)
+
+
+def test_two_agents_learn_into_one_table(tmp_path):
+    q_path = tmp_path / "q_table.json"
+    first, second = agent(q_path), agent(q_path)
+
+    first.update(STATE, "a", 1.0)   # 0 -> 0.5
+    second.update(STATE, "a", 1.0)  # applied to the shared 0.5, not its stale 0: -> 0.75
+    assert second.q_for(STATE)["a"] == 0.75
+    assert first.q_for(STATE)["a"] == 0.75
+    first.close()
+    second.close()
+
+
+def test_concurrent_updates_are_not_lost(tmp_path):
+    table = SharedQTable(tmp_path / "q.sqlite3")
+    other = SharedQTable(tmp_path / "q.sqlite3")
+
+    def bump(shared):
+        for _ in range(50):
+            shared.update("s", "a", lambda q: q + 1.0)
+
+    threads = [threading.Thread(target=bump, args=(t,)) for t in (table, other)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert table.update("s", "a", lambda q: q) == (100.0, 100.0)
+    table.close()
+    other.close()
+
+
+def test_import_table_only_seeds_an_empty_database(tmp_path):
+    shared = SharedQTable(tmp_path / "q.sqlite3")
+    assert shared.import_table({state_key(STATE): {"a": 1.0}})
+    assert not shared.import_table({state_key(STATE): {"a": 2.0}})
+    assert shared.changes(force=True) == [(state_key(STATE), "a", 1.0)]
+    assert shared.changes(force=True) == []
+    shared.close()
+
+
+@pytest.mark.parametrize("staleness, expected", [(0.0, 1), (3600.0, 0)])
+def test_changes_are_polled_at_most_once_per_staleness_window(tmp_path, staleness, expected):
+    reader = SharedQTable(tmp_path / "q.sqlite3", max_staleness=staleness)
+    reader.changes()
+    writer = SharedQTable(tmp_path / "q.sqlite3")
+    writer.update("s", "a", lambda q: 1.0)
+    assert len(reader.changes()) == expected
+    reader.close()
+    writer.close()
@@ -0,0 +1,75 @@
+import json
+import random
+
+import numpy as np
+
+from backend.q_store import QStore
+from backend.rl_agent import RLAgent
+from backend.state import state_key
+
+STATE = {"len": "short", "month": "2025-10", "sector": "mining", "size": "large", "topic": "scope"}
+
+
+def test_ids_are_interned_and_the_array_grows():
+    store = QStore(["a", "b"], initial_capacity=1)
+    ids = [store.id_of(("s", i)) for i in range(5)]
+    assert ids == list(range(5))
+    assert store.id_of(("s", 3)) == 3
+    assert store.find(("missing",)) is None
+    assert store.values.shape == (5, 2)
+    assert store.values.dtype == np.float32
+
+
+def test_json_round_trip_keeps_values_and_extra_actions():
+    table = {state_key(STATE): {"a": 0.3, "b": -1.25, "only_in_file": 2.0}}
+    store = QStore.from_dict(table, ["a", "b"])
+    assert store.actions == ["a", "b", "only_in_file"]
+    # shortest decimal form, not the float32 expansion of 0.3
+    assert store.to_dict() == table
+    assert store.row_dict(0) == {"a": 0.3, "b": -1.25, "only_in_file": 2.0}
+
+
+def test_argmax_random_breaks_ties_among_the_best_actions():
+    store = QStore(["a", "b", "c"])
+    sid = store.id_of(("s",))
+    store.set(sid, "a", 1.0)
+    store.set(sid, "c", 1.0)
+    picks = {store.argmax_random(sid, random.Random(seed)) for seed in range(50)}
+    assert picks == {"a", "c"}
+
+
+def test_copy_rows_is_detached_from_later_updates():
+    store = QStore(["a"])
+    sid = store.id_of(("s",))
+    states, values = store.copy_rows()
+    store.set(sid, "a", 5.0)
+    store.id_of(("t",))
+    assert states == [("s",)] and values.tolist() == [[0.0]]
+
+
+def test_agent_q_for_returns_clean_floats(tmp_path):
+    agent = RLAgent(actions=["a", "b"], alpha=0.3, q_path=tmp_path / "q_table.json")
+    agent.update(STATE, "a", 1.0)
+    assert agent.q_for(STATE) == {"a": 0.3, "b": 0.0}
+    with (tmp_path / "q_table.json").open(encoding="utf-8") as f:
+        assert json.load(f) == {state_key(STATE): {"a": 0.3, "b": 0.0}}
+
+
+def test_json_mode_rewrites_only_the_updated_row(tmp_path, monkeypatch):
+    path = tmp_path / "q_table.json"
+    other = dict(STATE, sector="energy")
+    path.write_text(json.dumps({state_key(other): {"a": 0.5, "b": 0.0}}), encoding="utf-8")
+    agent = RLAgent(actions=["a", "b"], alpha=0.3, q_path=path)
+    agent.update(STATE, "a", 1.0)
+
+    # after the first save, updates must not convert the whole table again
+    def full_conversion():
+        raise AssertionError("to_dict called on an incremental update")
+
+    monkeypatch.setattr(agent._store, "to_dict", full_conversion)
+    agent.update(STATE, "b", -1.0)
+    agent.update(dict(STATE, size="small"), "a", 1.0)
+    monkeypatch.undo()
+
+    with path.open(encoding="utf-8") as f:
+        assert json.load(f) == agent._store.to_dict()
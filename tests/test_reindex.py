@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("pdfplumber")
+pytest.importorskip("nltk")
+
+from backend import embedding_generation  # noqa: E402
+from backend.embedding_generation import Embedding_Generation  # noqa: E402
+
+
+class FakeCollection:
+    def __init__(self):
+        self.rows = {}
+        self.embedded = []
+
+    def upsert(self, ids, embeddings, metadatas, documents):
+        self.embedded.extend(ids)
+        self.rows.update(zip(ids, metadatas))
+
+    def update(self, ids, metadatas):
+        for chunk_id, meta in zip(ids, metadatas):
+            self.rows[chunk_id] = meta
+
+    def delete(self, ids=None, where=None):
+        for chunk_id in list(ids or []):
+            self.rows.pop(chunk_id, None)
+        if where is not None:
+            self.rows = {
+                k: m for k, m in self.rows.items()
+                if any(m.get(f) != v for f, v in where.items())
+            }
+
+    def count(self):
+        return len(self.rows)
+
+
+@pytest.fixture
+def generator(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_generation, "manifest_path", tmp_path / "manifest.json")
+    texts = {"a.pdf": "One.|Two.|Three."}
+    (tmp_path / "a.pdf").write_bytes(b"%PDF a")
+
+    gen = Embedding_Generation.__new__(Embedding_Generation)
+    gen.collection = FakeCollection()
+    gen.custom_embeddings = lambda batch: np.zeros((len(batch), 2), dtype=np.float32)
+    gen.data_path = str(tmp_path)
+    gen.split_text = lambda text: text.split("|")
+    gen.iter_documents = lambda names, workers=1: (
+        {"id": n, "text": texts[n], "metadata": {"source": n, "page_count": 1}} for n in names
+    )
+    gen.texts = texts
+    return gen
+
+
+def sources(collection):
+    return sorted(m["text"] for m in collection.rows.values())
+
+
+def test_first_reindex_replaces_a_legacy_collection(generator):
+    # rows written by the original ingestion: positional ids and no manifest
+    for i, text in enumerate(["One.", "Two.", "Three."], start=1):
+        generator.collection.rows[f"a.pdf_chunk{i}"] = {
+            "source": "a.pdf", "chunk_number": i, "page_count": 1, "text": text,
+        }
+
+    generator.reindex()
+    assert sources(generator.collection) == ["One.", "Three.", "Two."]
+    assert not any("_chunk" in chunk_id for chunk_id in generator.collection.rows)
+
+
+def test_an_inserted_chunk_only_embeds_the_new_text(generator, tmp_path):
+    generator.reindex()
+    generator.collection.embedded.clear()
+
+    generator.texts["a.pdf"] = "Zero.|One.|Two.|Three."
+    (tmp_path / "a.pdf").write_bytes(b"%PDF a, edited")
+    generator.reindex()
+
+    assert len(generator.collection.embedded) == 1
+    assert sources(generator.collection) == ["One.", "Three.", "Two.", "Zero."]
+    numbers = {m["text"]: m["chunk_number"] for m in generator.collection.rows.values()}
+    assert numbers == {"Zero.": 1, "One.": 2, "Two.": 3, "Three.": 4}
+
+
+def test_ingest_replaces_legacy_rows_and_writes_the_manifest(generator):
+    generator.collection.rows["a.pdf_chunk1"] = {"source": "a.pdf", "chunk_number": 1, "text": "One."}
+    generator.ingest()
+    assert sources(generator.collection) == ["One.", "Three.", "Two."]
+
+    generator.collection.embedded.clear()
+    assert generator.reindex()["embedded_chunks"] == 0
+    assert generator.collection.embedded == []
@@ -0,0 +1,89 @@
+import math
+
+import numpy as np
+import pytest
+
+from backend.relevance import GHG_KEYWORDS, GHGRelevanceClassifier
+
+
+def _unit(degrees):
+    # on-topic prototype at 0 degrees, off-topic at 90: margin = cos(a) - sin(a)
+    a = math.radians(degrees)
+    return [math.cos(a), math.sin(a)]
+
+
+VECTORS = {
+    "ON": _unit(0),
+    "OFF": _unit(90),
+    "close to on-topic": _unit(20),                 # margin ~0.60
+    "even, no keyword": _unit(44),                  # margin ~0.03
+    "even, about emissions": _unit(44),
+    "leaning off-topic": _unit(60),                 # margin ~-0.37
+    "leaning off-topic, about emissions": _unit(60),
+    "slightly off-topic": _unit(48),                # margin ~-0.05
+}
+
+
+def fake_embed(texts):
+    return np.array([VECTORS[t] for t in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def gate():
+    return GHGRelevanceClassifier(fake_embed, ["emissions"], on_topic=["ON"], off_topic=["OFF"])
+
+
+def test_clear_on_topic_margin_is_accepted(gate):
+    assert gate.classify("close to on-topic") == "True"
+
+
+def test_keyword_accepts_at_even_margin(gate):
+    assert gate.classify("even, about emissions") == "True"
+    assert gate.classify("even, no keyword") is None
+
+
+def test_clear_off_topic_is_rejected_only_without_keyword(gate):
+    assert gate.classify("leaning off-topic") == "False"
+    assert gate.classify("leaning off-topic, about emissions") is None
+
+
+def test_small_off_topic_lead_is_escalated(gate):
+    assert gate.classify("slightly off-topic") is None
+
+
+def test_metrics_count_outcomes(gate):
+    for prompt in ("close to on-topic", "leaning off-topic", "even, no keyword"):
+        gate.classify(prompt)
+    m = gate.metrics()
+    assert (m["accepted"], m["rejected"], m["escalated"], m["total"]) == (1, 1, 1, 3)
+    assert m["escalation_rate"] == pytest.approx(1 / 3)
+
+
+# Held-out prompts (not among the prototypes) for the default margins with the real model.
+ON_TOPIC = [
+    "How do I report emissions from our refrigerant leaks?",
+    "Does our company need to disclose scope 3 emissions under the new standard?",
+    "What is the difference between location-based and market-based scope 2?",
+    "How often do we have to submit an NGER report?",
+    "Which climate scenarios should we use for our risk disclosure?",
+    "Good morning!",
+    "Thanks, that was useful",
+]
+OFF_TOPIC = [
+    "Write a SQL query that joins two tables.",
+    "What is a good vegetarian lasagna recipe?",
+    "Which hotels in Rome are close to the Colosseum?",
+    "How do I treat a sprained ankle?",
+    "Who is the best basketball player of all time?",
+    "Tell me a joke about cats.",
+]
+
+
+def test_default_margins_make_no_confident_mistakes():
+    sentence_transformers = pytest.importorskip("sentence_transformers")
+    model = sentence_transformers.SentenceTransformer("sentence-transformers/all-MiniLM-L12-v2")
+    gate = GHGRelevanceClassifier(lambda texts: model.encode(list(texts)), GHG_KEYWORDS)
+
+    wrong = [p for p in ON_TOPIC if gate.classify(p) == "False"]
+    wrong += [p for p in OFF_TOPIC if gate.classify(p) == "True"]
+    assert wrong == []
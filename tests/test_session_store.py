@@ -0,0 +1,69 @@
+import threading
+
+import numpy as np
+
+from backend.session_store import SessionStore
+
+
+class FakeAssistant:
+    def __init__(self):
+        self.state = {}
+
+    def export_state(self):
+        return self.state
+
+    def load_state(self, state):
+        self.state = state
+
+
+def store(tmp_path, **kw):
+    return SessionStore(tmp_path / "sessions", assistant_factory=FakeAssistant, **kw)
+
+
+def test_evicted_session_is_rehydrated(tmp_path):
+    sessions = store(tmp_path)
+    session = sessions.get("s1")
+    session.add_message("user", "hello")
+    session.assistant.state = {"turns": 1}
+    session.add_file("report.pdf", embeddings=np.array([[0.1, 0.2]], dtype=np.float32))
+
+    assert sessions.evict("s1")
+    restored = sessions.get("s1")
+    assert restored is not session
+    assert restored.messages == [{"role": "user", "content": "hello"}]
+    assert restored.assistant.state == {"turns": 1}
+    embeddings = restored.processed_files["report.pdf"]["embeddings"]
+    assert embeddings.dtype == np.float64
+    np.testing.assert_array_equal(embeddings, np.float32([[0.1, 0.2]]))
+    assert sessions.metrics()["rehydrated"] == 1
+
+
+def test_surplus_sessions_are_spilled_least_recently_used_first(tmp_path):
+    sessions = store(tmp_path, max_live_sessions=2, busy_seconds=0.0)
+    for name in ("a", "b", "c"):
+        sessions.get(name)
+    metrics = sessions.metrics()
+    assert metrics["live"] == 2 and metrics["on_disk"] == 1
+    assert list(sessions._live) == ["b", "c"]
+
+
+def test_eviction_io_runs_outside_the_store_lock(tmp_path):
+    sessions = store(tmp_path)
+    session = sessions.get("slow")
+    writing, release = threading.Event(), threading.Event()
+
+    def slow_to_dict():
+        writing.set()
+        release.wait(5)
+        return {"session_id": "slow", "assistant": {}, "messages": [],
+                "last_turn": None, "processed_files": {}}
+
+    session.to_dict = slow_to_dict
+    spill = threading.Thread(target=sessions.evict, args=("slow",))
+    spill.start()
+    assert writing.wait(5)
+    # other sessions are served while "slow" is being written
+    assert sessions.get("other").session_id == "other"
+    release.set()
+    spill.join()
+    assert sessions.metrics()["evicted"] == 1
@@ -0,0 +1,59 @@
+import random
+import re
+
+import pytest
+
+from backend.state import (
+    TOPIC_BUCKETS, _bucket, encode_state, encode_states, state_from_tuple, state_key,
+    state_tuple,
+)
+
+WORDS = [
+    "How", "do", "we", "report", "scope 3", "emissions", "lawsuit", "budget", "carbon",
+    "offsets", "net zero", "netzero", "CO2", "regulatory", "fund", "Scope2", "weather",
+    "footprint", "prices", "the", "policy", "compliance", "?", "." * 90,
+]
+COMPANIES = [None, {}, {"sector": "Mining", "size": "Large"}, {"sector": "Energy"}]
+
+
+def prompts(n, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=rng.randint(0, 12))) for _ in range(n)]
+
+
+def reference_bucket(text):
+    # the original per-pattern loop the precompiled matcher replaces
+    t = (text or "").lower()
+    for name, patterns in TOPIC_BUCKETS.items():
+        if any(re.search(p, t) for p in patterns):
+            return name
+    return "other"
+
+
+def test_bucket_matches_the_plain_regex_loop():
+    for prompt in prompts(500):
+        assert _bucket(prompt) == reference_bucket(prompt), prompt
+
+
+def test_encode_states_matches_encode_state():
+    texts = prompts(300, seed=1)
+    companies = [COMPANIES[i % len(COMPANIES)] for i in range(len(texts))]
+    columns = encode_states(texts, companies)
+    for i, (text, company) in enumerate(zip(texts, companies)):
+        row = {field: values[i] for field, values in columns.items()}
+        assert row == encode_state(text, company)
+
+
+def test_encode_states_shared_company_and_month_overrides():
+    columns = encode_states(["a", "b"], {"sector": "Mining"}, months=["2025-01", None])
+    assert list(columns["sector"]) == ["mining", "mining"]
+    assert columns["month"][0] == "2025-01"
+    assert columns["month"][1] == encode_state("b", None)["month"]
+
+
+@pytest.mark.parametrize("state", [
+    encode_state("What are scope 1 emissions?", {"sector": "Mining"}),
+    {"custom": 1, "other": "x"},
+])
+def test_state_tuple_round_trips_to_the_same_key(state):
+    assert state_key(state_from_tuple(state_tuple(state))) == state_key(state)
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("spacy")
+pytest.importorskip("groq")
+
+from backend.turn_orchestrator import run_turn  # noqa: E402
+
+
+class FakeAssistant:
+    off_topic_message = "off topic"
+    disclaimer = " [disclaimer]"
+
+    def __init__(self, related, local=None, llm_seconds=0.01):
+        self.related = related
+        self.local = local  # local gate decision; None escalates to the LLM gate
+        self.llm_seconds = llm_seconds
+        self.events = []
+        self.answers = []
+        self.cache_threads = []
+
+    async def local_gate_async(self, prompt):
+        await asyncio.sleep(0.001)
+        return self.local
+
+    async def llm_gate_async(self, prompt):
+        self.events.append("llm gate start")
+        await asyncio.sleep(self.llm_seconds)
+        self.events.append("llm gate end")
+        return self.related
+
+    def is_legal_or_financial(self, prompt):
+        return False
+
+    def cached_answer(self, prompt, chunk_ids):
+        self.cache_threads.append(threading.current_thread())
+        return None
+
+    async def complete(self, prompt, context):
+        return f"answer from {context}"
+
+    def remember_answer(self, answer):
+        self.answers.append(answer)
+
+    def cache_answer(self, prompt, chunk_ids, answer):
+        self.cache_threads.append(threading.current_thread())
+
+
+def recorder(calls, assistant=None, seconds=0.0):
+    def retrieve():
+        calls.append(threading.current_thread().name)
+        if assistant is not None:
+            assistant.events.append("retrieval start")
+        time.sleep(seconds)
+        return ["chunk"], [{"id": "c1"}]
+    return retrieve
+
+
+def test_on_topic_turn_generates_from_retrieved_chunks():
+    calls = []
+    result = asyncio.run(run_turn(FakeAssistant("True"), "q", recorder(calls)))
+    assert result["answer"] == "answer from chunk"
+    assert result["related"] and calls
+    assert set(result["timings"]) >= {"gate", "retrieval", "generation", "total"}
+
+
+def test_local_rejection_skips_retrieval():
+    calls = []
+    assistant = FakeAssistant("True", local="False")
+    result = asyncio.run(run_turn(assistant, "q", recorder(calls)))
+    assert result == {
+        "answer": "off topic", "related": False, "chunks": [], "metas": [],
+        "timings": result["timings"],
+    }
+    assert calls == [] and assistant.events == []
+
+
+def test_local_acceptance_runs_retrieval_without_the_llm_gate():
+    calls = []
+    assistant = FakeAssistant("False", local="True")
+    result = asyncio.run(run_turn(assistant, "q", recorder(calls)))
+    assert result["answer"] == "answer from chunk" and len(calls) == 1
+    assert "llm gate start" not in assistant.events
+
+
+def test_escalated_gate_overlaps_retrieval():
+    calls = []
+    assistant = FakeAssistant("True", local=None, llm_seconds=0.4)
+    started = time.perf_counter()
+    result = asyncio.run(run_turn(assistant, "q", recorder(calls, assistant, seconds=0.3)))
+    elapsed = time.perf_counter() - started
+
+    assert result["answer"] == "answer from chunk"
+    # retrieval runs while the LLM gate is still deciding, not after it
+    assert assistant.events.index("retrieval start") < assistant.events.index("llm gate end")
+    assert elapsed < 0.4 + 0.3
+
+
+def test_answer_cache_runs_off_the_event_loop():
+    assistant = FakeAssistant("True", local="True")
+    asyncio.run(run_turn(assistant, "q", recorder([])))
+    # lookup + store both encode the question; neither may block the loop thread
+    assert len(assistant.cache_threads) == 2
+    assert threading.main_thread() not in assistant.cache_threads